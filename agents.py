@@ -1,10 +1,15 @@
-from pydantic import BaseModel
 import asyncio
-from typing import List, Callable, Optional, Any, Dict, Type, Union
+from typing import TYPE_CHECKING, List, Callable, Optional, Any, Dict, Type, Union
 import time
+from model_settings import ModelSettings, effective_settings
+from structured_output import IncrementalJSONObject, dump_output, json_schema, response_format_for, validate_output
+from usage import UsageLedger, completion_budget, record_estimated_usage, record_usage, track_usage
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
 
 class GuardrailFunctionOutput:
-    def __init__(self, output_info: BaseModel, tripwire_triggered: bool):
+    def __init__(self, output_info: "BaseModel", tripwire_triggered: bool):
         self.output_info = output_info
         self.tripwire_triggered = tripwire_triggered
 
@@ -12,6 +17,17 @@ class InputGuardrail:
     def __init__(self, guardrail_function: Callable):
         self.guardrail_function = guardrail_function
 
+class InputGuardrailTripwireTriggered(Exception):
+    def __init__(self, guardrail_output: GuardrailFunctionOutput):
+        super().__init__("Input guardrail tripwire triggered")
+        self.guardrail_output = guardrail_output
+
+class RunContextWrapper:
+    def __init__(self, context: Optional[Dict] = None, api_key: Optional[str] = None):
+        self.context = context
+        # The caller's API key, so guardrails can make their own calls with it
+        self.api_key = api_key
+
 class Agent:
     def __init__(
         self,
@@ -19,8 +35,12 @@ class Agent:
         instructions: str,
         handoffs: Optional[List["Agent"]] = None,
         input_guardrails: Optional[List[InputGuardrail]] = None,
-        output_type: Optional[Type[BaseModel]] = None,
-        handoff_description:str = ""
+        output_type: Optional[Type["BaseModel"]] = None,
+        handoff_description:str = "",
+        router: Optional[Any] = None,
+        fallback_models: Optional[List[str]] = None,
+        model_settings: Optional[ModelSettings] = None,
+        early_exit_fields: Optional[List[str]] = None
     ):
         self.name = name
         self.instructions = instructions
@@ -28,275 +48,934 @@ class Agent:
         self.input_guardrails = input_guardrails if input_guardrails is not None else []
         self.output_type = output_type
         self.handoff_description = handoff_description
+        self.router = router
+        # Models tried in order when the primary model fails (None: OPENAI_FALLBACK_MODELS)
+        self.fallback_models = fallback_models
+        # Model and generation parameters; unset fields use model_settings.default_model_settings
+        self.model_settings = model_settings
+        # With an output_type: stop reading the answer once these fields are complete
+        # (fields it never gets to must have defaults)
+        self.early_exit_fields = early_exit_fields if early_exit_fields is not None else []
 
 class RunResult:
-    def __init__(self, final_output: Any, agent_used: Optional[str] = None):
+    def __init__(self, final_output: Any, agent_used: Optional[str] = None, usage: Optional[UsageLedger] = None):
         self.final_output = final_output
         self.agent_used = agent_used
+        # Tokens and estimated cost of every model call made for this request
+        self.usage = usage
     
-    def final_output_as(self, output_type: Type[BaseModel]):
-        return output_type(**self.final_output)
+    def final_output_as(self, output_type: Type["BaseModel"]):
+        """The final output validated as `output_type`, whether it is parsed data, JSON text or an instance."""
+        return validate_output(output_type, self.final_output)
 
-class trace:
-    def __init__(self, name: str):
-        self.name = name
+class StreamEvent:
+    def __init__(self, delta: str, agent_used: Optional[str] = None, usage: Optional[UsageLedger] = None):
+        self.delta = delta
+        self.agent_used = agent_used
+        # Only set on the last event of a run, once the request's usage is known
+        self.usage = usage
 
-    def __enter__(self):
-        self.start_time = time.time()
-        print(f"Starting trace: {self.name}")
-        return self
+import os
+import json
+from clients import client_pool
+from tracing import SpanSteps, span, trace
+from memory import ConversationMemory, Summarizer
+from batch import BatchItem, RateLimitBackoff, retry_after_seconds
+from registry import AgentRegistry
+from cache import build_response_cache, build_routing_cache
+from resilience import complete, default_fallback_models, rate_limit_retries, specialist_policy, triage_policy
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        end_time = time.time()
-        duration = end_time - self.start_time
-        print(f"Trace '{self.name}' finished in {duration:.4f} seconds")
+# Returned instead of an answer when an input guardrail trips
+GUARDRAIL_REJECTION_MESSAGE = "Sorry, I can only help with questions about web application development."
 
-import os
-from openai import AsyncOpenAI
+# Sent after a streamed answer that was cut off by the adaptive max_tokens limit
+CONTINUE_PROMPT = "Continue your answer exactly where it stopped, without repeating anything."
+
+# In fan-out mode, locally ranked agents scoring below this fraction of the best score are not consulted
+FANOUT_RELEVANCE = 0.75
+
+# Cache of specialist answers keyed by agent and normalized query
+response_cache = build_response_cache()
+# Cache of triage decisions keyed by query fingerprint
+routing_cache = build_routing_cache()
 
 class Runner:
     @staticmethod
-    async def run(agent: Agent, input_data: str, context: Optional[Dict] = None):
+    def _models(agent: Agent) -> List[str]:
+        """The agent's model followed by its fallback chain."""
+        model = effective_settings(agent).model
+        fallbacks = agent.fallback_models if agent.fallback_models is not None else default_fallback_models
+        return [model] + [fallback for fallback in fallbacks if fallback != model]
+
+    @staticmethod
+    def _response_format(agent: Agent) -> Optional[Dict]:
+        """The agent's own response_format, or else one derived from its output_type."""
+        settings = effective_settings(agent)
+        if settings.response_format is not None or not agent.output_type:
+            return settings.response_format
+        return response_format_for(agent.output_type, settings.model)
+
+    @staticmethod
+    def _generation_kwargs(agent: Agent, adaptive: bool = True) -> Dict:
         """
-        Run the agent with the given input data and context.
-        
-        Args:
-            agent: The agent to run
-            input_data: The user's input message
-            context: Optional context information
-            
-        Returns:
-            RunResult containing the agent's response and which agent was used
+        Generation parameters for the agent's answer, including the response format of structured outputs.
+
+        With `adaptive`, max_tokens is sized from the agent's recent answer
+        lengths (see usage.CompletionBudget) instead of the configured limit.
         """
-        try:
-            # Initialize the OpenAI client
-            client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        kwargs = effective_settings(agent).to_kwargs()
+        response_format = Runner._response_format(agent)
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        if adaptive and "max_tokens" in kwargs:
+            kwargs["max_tokens"] = completion_budget.max_tokens(agent.name, kwargs["max_tokens"])
+        return kwargs
+
+    @staticmethod
+    def _triage_messages(agent: Agent, input_data: str, task: str, answer_format: str) -> List[Dict]:
+        # Prepare the system message for triage
+        triage_system_message = {
+            "role": "system",
+            "content": f"""
+            {agent.instructions}
             
-            # Track which agent is being used
-            current_agent = agent
-            agent_used = agent.name
+            {task}
+            Available agents:
+            {', '.join([a.name + ': ' + a.handoff_description for a in agent.handoffs])}
             
-            # For the triage agent, determine which specialist agent to use
-            if agent.name == "Triage Agent" and agent.handoffs:
-                # First, check if the input passes the guardrails
-                for guardrail in agent.input_guardrails:
-                    # This is a simplified version - in a real implementation,
-                    # you would actually call the guardrail function
-                    pass
-                
-                # Prepare the system message for triage
-                triage_system_message = {
-                    "role": "system",
-                    "content": f"""
-                    {agent.instructions}
-                    
-                    You must select the most appropriate specialist agent to handle this query.
-                    Available agents:
-                    {', '.join([a.name + ': ' + a.handoff_description for a in agent.handoffs])}
-                    
-                    Respond ONLY with the name of the agent that should handle this query.
-                    """
-                }
-                
-                # Prepare the user message
-                triage_user_message = {
-                    "role": "user",
-                    "content": input_data
-                }
-                
+            {answer_format}
+            """
+        }
+
+        # Prepare the user message
+        triage_user_message = {
+            "role": "user",
+            "content": input_data
+        }
+        return [triage_system_message, triage_user_message]
+
+    @staticmethod
+    def _is_follow_up(memory: Optional[ConversationMemory]) -> bool:
+        return memory is not None and not memory.is_empty
+
+    @staticmethod
+    def _triage_input(input_data: str, memory: Optional[ConversationMemory]) -> str:
+        """The question for LLM triage, with the conversation so far when it is a follow-up."""
+        if not Runner._is_follow_up(memory):
+            return input_data
+        previous = f"\n\nThe last answer came from the {memory.last_agent}; keep it for questions that continue that topic." if memory.last_agent else ""
+        return f"Conversation so far:\n{memory.last_exchange()}{previous}\n\nNew question: {input_data}"
+
+    @staticmethod
+    async def _select_agent(client, agent: Agent, input_data: str, memory: Optional[ConversationMemory] = None) -> Agent:
+        """
+        Pick the agent that should answer the input.
+
+        For the triage agent this makes the triage call and returns the selected
+        specialist; any other agent answers directly. Unless the local router is
+        confident, a follow-up question (one with conversation history) is
+        triaged together with the conversation so far.
+        """
+        current_agent = agent
+
+        # For the triage agent, determine which specialist agent to use
+        if agent.name == "Triage Agent" and agent.handoffs:
+            # Follow-ups ("and how do I deploy it?") depend on the conversation, so they
+            # are neither answered from nor stored in the routing cache
+            follow_up = Runner._is_follow_up(memory)
+            use_routing_cache = routing_cache is not None and not follow_up
+            with span("triage", agent=agent.name, follow_up=follow_up) as triage_span:
+                # Reuse the routing decision made for an equivalent question
+                cached_agent = routing_cache.get(agent, input_data) if use_routing_cache else None
+                if cached_agent is not None:
+                    triage_span.set_attribute("route", "routing_cache")
+                    return cached_agent
+
+                # Try the local router next; it only answers when it is confident
+                if agent.router is not None:
+                    routed_agent = agent.router.route(input_data)
+                    if routed_agent is not None:
+                        triage_span.set_attribute("route", "local_router")
+                        return routed_agent
+
+                # Otherwise fall back to LLM triage
                 # Call the OpenAI API for triage
-                triage_response = await client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[triage_system_message, triage_user_message],
-                    temperature=0.3,
-                    max_tokens=100
+                triage_response = await complete(
+                    client.chat.completions.create,
+                    Runner._models(agent),
+                    triage_policy,
+                    messages=Runner._triage_messages(
+                        agent,
+                        Runner._triage_input(input_data, memory),
+                        "You must select the most appropriate specialist agent to handle this query.",
+                        "Respond ONLY with the name of the agent that should handle this query."
+                    ),
+                    **effective_settings(agent).to_kwargs()
                 )
-                
+                triage_span.set_attribute("route", "llm")
+                triage_span.record_usage(triage_response)
+                record_usage(agent.name, triage_response)
+
                 # Extract the selected agent name
                 selected_agent_name = triage_response.choices[0].message.content.strip()
-                
+
                 # Find the corresponding agent object
                 for handoff_agent in agent.handoffs:
                     if handoff_agent.name.lower() in selected_agent_name.lower():
                         current_agent = handoff_agent
-                        agent_used = handoff_agent.name
+                        if use_routing_cache:
+                            routing_cache.set(agent, input_data, handoff_agent)
                         break
-            
-            # Prepare the system message with the selected agent's instructions
-            system_message = {
-                "role": "system",
-                "content": current_agent.instructions
-            }
-            
-            # Prepare the user message
-            user_message = {
-                "role": "user",
-                "content": input_data
-            }
-            
-            # Call the OpenAI API with the selected agent
-            response = await client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=[system_message, user_message],
-                temperature=0.7,
-                max_tokens=1000
+
+        return current_agent
+
+    @staticmethod
+    async def _rank_agents(
+        client, agent: Agent, input_data: str, k: int, memory: Optional[ConversationMemory] = None
+    ) -> List[Agent]:
+        """
+        Pick up to k handoff agents for the input, most relevant first.
+
+        When the local router is confident, its ranking is used, keeping only the
+        agents that score close to the best one. Otherwise the LLM is asked for a
+        ranked list, which is where questions spanning several domains end up.
+        """
+        if not agent.handoffs:
+            return [agent]
+
+        with span("triage", agent=agent.name, top_k=k) as triage_span:
+            if agent.router is not None and agent.router.route(input_data) is not None:
+                ranking = agent.router.rank(input_data)
+                best_score = ranking[0][1]
+                selected = [a for a, score in ranking[:k] if score >= FANOUT_RELEVANCE * best_score]
+                triage_span.set_attribute("route", "local_router")
+            else:
+                triage_response = await complete(
+                    client.chat.completions.create,
+                    Runner._models(agent),
+                    triage_policy,
+                    messages=Runner._triage_messages(
+                        agent,
+                        Runner._triage_input(input_data, memory),
+                        f"You must select the specialist agents needed to fully answer this query (at most {k}), most relevant first. Only include agents whose expertise is clearly required.",
+                        "Respond ONLY with the names of the selected agents, separated by commas."
+                    ),
+                    **effective_settings(agent).to_kwargs()
+                )
+                triage_span.set_attribute("route", "llm")
+                triage_span.record_usage(triage_response)
+                record_usage(agent.name, triage_response)
+
+                # Keep the agents in the order the model listed them
+                reply = triage_response.choices[0].message.content.lower()
+                mentioned = [(reply.find(a.name.lower()), a) for a in agent.handoffs]
+                selected = [a for position, a in sorted(mentioned, key=lambda m: m[0]) if position >= 0][:k]
+            triage_span.set_attribute("selected", ", ".join(a.name for a in selected))
+
+        return selected or [agent]
+
+    @staticmethod
+    async def _synthesize(client, input_data: str, answers: List) -> str:
+        """Merge several specialists' answers into one with a single LLM call."""
+        synthesizer_agent = get_agent("synthesizer_agent")
+        with span("synthesize", answers=len(answers)) as synthesize_span:
+            response = await complete(
+                client.chat.completions.create,
+                Runner._models(synthesizer_agent),
+                specialist_policy,
+                hedge=False,
+                key=synthesizer_agent.name,
+                messages=[
+                    {"role": "system", "content": synthesizer_agent.instructions},
+                    {"role": "user", "content": f"Question:\n{input_data}\n\n" + "\n\n".join(
+                        f"Answer from the {name}:\n{answer}" for name, answer in answers
+                    )}
+                ],
+                **effective_settings(synthesizer_agent).to_kwargs()
             )
-            
+            synthesize_span.record_usage(response)
+            record_usage(synthesizer_agent.name, response)
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _concatenate(answers: List) -> str:
+        return "\n\n".join(f"### {name}\n\n{answer}" for name, answer in answers)
+
+    @staticmethod
+    def _build_messages(agent: Agent, input_data: str, memory: Optional[ConversationMemory] = None) -> List[Dict]:
+        # Prepare the system message with the selected agent's instructions
+        system_message = {
+            "role": "system",
+            "content": agent.instructions
+        }
+
+        # Agents with an output type must answer with a JSON object matching its schema.
+        # With a json_schema response format the provider enforces it, so it is not repeated here.
+        if agent.output_type and (Runner._response_format(agent) or {}).get("type") != "json_schema":
+            system_message["content"] += (
+                "\n\nRespond ONLY with a JSON object matching this JSON schema:\n"
+                + json.dumps(json_schema(agent.output_type))
+            )
+
+        # Prepare the user message
+        user_message = {
+            "role": "user",
+            "content": input_data
+        }
+
+        # Earlier turns go between the (stable) system message and the new question
+        history = memory.messages() if memory is not None else []
+        return [system_message, *history, user_message]
+
+    @staticmethod
+    def _summarizer(client, memory: ConversationMemory) -> Summarizer:
+        """Summarizer that folds old conversation turns into the running summary with an LLM call."""
+        summarizer_agent = get_agent("summarizer_agent")
+
+        async def summarize(summary: str, turns: List) -> str:
+            transcript = "\n\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in turns)
+            with span("summarize", turns=len(turns)) as summarize_span:
+                # Runs in the background, so there is no point hedging it
+                response = await complete(
+                    client.chat.completions.create,
+                    Runner._models(summarizer_agent),
+                    specialist_policy,
+                    hedge=False,
+                    key=summarizer_agent.name,
+                    messages=[
+                        {"role": "system", "content": summarizer_agent.instructions},
+                        {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+                    ],
+                    # The memory decides how long its summary may be
+                    **{**effective_settings(summarizer_agent).to_kwargs(), "max_tokens": memory.summary_budget}
+                )
+                summarize_span.record_usage(response)
+                record_usage(summarizer_agent.name, response)
+            return response.choices[0].message.content.strip()
+        return summarize
+
+    @staticmethod
+    async def _answer(client, agent: Agent, input_data: str, memory: Optional[ConversationMemory] = None) -> str:
+        """Get the agent's complete answer, from the response cache when possible."""
+        with span("specialist", agent=agent.name) as specialist_span:
+            # Serve repeated questions from the response cache
+            use_cache = Runner._use_response_cache(memory)
+            response_content = await response_cache.get(agent, input_data) if use_cache else None
+            specialist_span.set_attribute("cache_hit", response_content is not None)
+            if response_content is not None:
+                return response_content
+
+            messages = Runner._build_messages(agent, input_data, memory)
+            if agent.output_type and agent.early_exit_fields:
+                response_content = await Runner._answer_early_exit(client, agent, messages, specialist_span)
+                if use_cache:
+                    response_cache.set(agent, input_data, response_content)
+                return response_content
+
+            for adaptive in (True, False):
+                # Call the OpenAI API with the agent, retrying and failing over as needed
+                generation_kwargs = Runner._generation_kwargs(agent, adaptive)
+                response = await complete(
+                    client.chat.completions.create,
+                    Runner._models(agent),
+                    specialist_policy,
+                    key=agent.name,
+                    messages=messages,
+                    **generation_kwargs
+                )
+                specialist_span.record_usage(response)
+                record_usage(agent.name, response)
+                if response.choices[0].finish_reason != "length":
+                    break
+                completion_budget.record_truncation(agent.name)
+                if generation_kwargs.get("max_tokens") == effective_settings(agent).max_tokens:
+                    break
+                # Cut off by the adaptive limit: ask again with the configured one
+                specialist_span.set_attribute("truncated_at", generation_kwargs["max_tokens"])
+            if response.usage is not None:
+                completion_budget.observe(agent.name, response.usage.completion_tokens)
+
             # Extract the response content
             response_content = response.choices[0].message.content
-            
-            # If the agent has an output type, try to parse the response
-            if current_agent.output_type:
+            if use_cache:
+                response_cache.set(agent, input_data, response_content)
+            return response_content
+
+    @staticmethod
+    async def _answer_early_exit(client, agent: Agent, messages: List[Dict], specialist_span) -> str:
+        """
+        Stream a structured answer and stop reading it once the agent's early_exit_fields are complete.
+
+        Returns the JSON text of the fields received by then (or of the whole
+        answer). Closing the stream early skips the rest of the generation, at
+        the price of the connection, which cannot be reused.
+        """
+        stream = await complete(
+            client.chat.completions.create,
+            Runner._models(agent),
+            specialist_policy,
+            hedge=False,
+            key=agent.name,
+            messages=messages,
+            **Runner._generation_kwargs(agent, adaptive=False),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        parser = IncrementalJSONObject()
+        model = None
+        chunks = stream.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), specialist_policy.timeout)
+                except StopAsyncIteration:
+                    return parser.buffer
+                model = chunk.model or model
+                if chunk.usage is not None:
+                    specialist_span.record_usage(chunk)
+                    record_usage(agent.name, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    fields = parser.feed(chunk.choices[0].delta.content)
+                    if all(field in fields for field in agent.early_exit_fields):
+                        specialist_span.set_attribute("early_exit", True)
+                        # The provider only reports usage at the end of the stream
+                        record_estimated_usage(agent.name, model, messages, parser.buffer)
+                        return json.dumps(fields)
+        finally:
+            await stream.close()
+
+    @staticmethod
+    def _get_memory(context: Optional[Dict]) -> Optional[ConversationMemory]:
+        return (context or {}).get("memory")
+
+    @staticmethod
+    def _get_session_usage(context: Optional[Dict]) -> Optional[UsageLedger]:
+        # Callers that keep a per-session ledger pass it as context["usage"]
+        return (context or {}).get("usage")
+
+    @staticmethod
+    def _use_response_cache(memory: Optional[ConversationMemory]) -> bool:
+        # Answers to follow-up questions depend on the conversation, so only first turns are cached
+        return response_cache is not None and (memory is None or memory.is_empty)
+
+    @staticmethod
+    def _remember(client, agent: Agent, memory: Optional[ConversationMemory], input_data: str, output: str):
+        # Structured outputs (e.g. guardrail checks) are not part of the conversation
+        if memory is None or agent.output_type:
+            return
+        memory.add_turn(input_data, output, agent.name)
+        memory.schedule_compaction(Runner._summarizer(client, memory))
+
+    @staticmethod
+    async def _run_input_guardrails(agent: Agent, input_data: str, context: Optional[Dict], api_key: Optional[str] = None):
+        """
+        Run all of the agent's input guardrails concurrently.
+
+        Raises InputGuardrailTripwireTriggered as soon as any guardrail trips,
+        cancelling the ones still running. A guardrail that fails with an error
+        is logged and treated as passed.
+        """
+        ctx = RunContextWrapper(context, api_key)
+
+        async def run_guardrail(guardrail: InputGuardrail) -> GuardrailFunctionOutput:
+            with span("guardrail", guardrail=guardrail.guardrail_function.__name__) as guardrail_span:
+                output = await guardrail.guardrail_function(ctx, agent, input_data)
+                guardrail_span.set_attribute("tripwire_triggered", output.tripwire_triggered)
+                return output
+
+        tasks = [asyncio.create_task(run_guardrail(guardrail)) for guardrail in agent.input_guardrails]
+        try:
+            for finished in asyncio.as_completed(tasks):
                 try:
-                    # For now, just return the raw text since we're not formatting as JSON
-                    return RunResult(final_output=response_content, agent_used=agent_used)
+                    output = await finished
                 except Exception as e:
-                    print(f"Error parsing response as {current_agent.output_type.__name__}: {e}")
-                    return RunResult(final_output=response_content, agent_used=agent_used)
+                    print(f"Error in input guardrail: {e}")
+                    continue
+                if output.tripwire_triggered:
+                    raise InputGuardrailTripwireTriggered(output)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _start_input_guardrails(
+        agent: Agent, input_data: str, context: Optional[Dict], api_key: Optional[str] = None
+    ) -> Optional[asyncio.Task]:
+        """Launch the agent's input guardrails in the background (None if it has none)."""
+        if not agent.input_guardrails:
+            return None
+        return asyncio.create_task(Runner._run_input_guardrails(agent, input_data, context, api_key))
+
+    @staticmethod
+    async def _until_tripwire(coro, guardrail_task: Optional[asyncio.Task]):
+        """
+        Await `coro` speculatively while the guardrails are still running.
+
+        If the guardrails trip first, `coro` is cancelled and the tripwire
+        exception is raised instead of waiting for it to finish.
+        """
+        if guardrail_task is None or guardrail_task.done():
+            if guardrail_task is not None:
+                guardrail_task.result()
+            return await coro
+
+        work_task = asyncio.ensure_future(coro)
+        try:
+            await asyncio.wait({guardrail_task, work_task}, return_when=asyncio.FIRST_COMPLETED)
+            if guardrail_task.done():
+                guardrail_task.result()
+            return await work_task
+        finally:
+            work_task.cancel()
+
+    @staticmethod
+    def _stop_input_guardrails(guardrail_task: Optional[asyncio.Task]):
+        if guardrail_task is None:
+            return
+        if guardrail_task.done():
+            # Mark the outcome as retrieved so asyncio does not log it
+            if not guardrail_task.cancelled():
+                guardrail_task.exception()
+        else:
+            guardrail_task.cancel()
+
+    @staticmethod
+    async def run(agent: Agent, input_data: str, context: Optional[Dict] = None, api_key: Optional[str] = None):
+        """
+        Run the agent with the given input data and context.
+        
+        Args:
+            agent: The agent to run
+            input_data: The user's input message
+            context: Optional context information
+            api_key: OpenAI API key for this request (defaults to OPENAI_API_KEY)
             
-            return RunResult(final_output=response_content, agent_used=agent_used)
+        Returns:
+            RunResult containing the agent's response and which agent was used
+        """
+        try:
+            return await Runner._run(agent, input_data, context, api_key)
         except Exception as e:
             print(f"Error in Runner.run: {e}")
             return RunResult(final_output=f"Error: {str(e)}", agent_used="Error")
 
-# Define WebdevOutput model
-class WebdevOutput(BaseModel):
-    is_webdev: bool
-    reasoning: str
+    @staticmethod
+    async def _run(
+        agent: Agent,
+        input_data: str,
+        context: Optional[Dict] = None,
+        api_key: Optional[str] = None,
+        retry_rate_limits: bool = True
+    ):
+        """
+        Same as run, but errors (e.g. rate limits) propagate to the caller.
 
-# Define all agents
-guardrail_agent = Agent(
-    name="Guardrail check",
-    instructions="Check if the user is asking about web application development.",
-    output_type=WebdevOutput,
-)
+        With retry_rate_limits=False, the run's own calls raise on the first rate
+        limit instead of retrying and failing over, for callers that back off
+        themselves. Nested runs, such as guardrails, still retry.
+        """
+        with span("run", agent=agent.name), track_usage(Runner._get_session_usage(context)) as usage, \
+                rate_limit_retries(retry_rate_limits):
+            # Guardrails run in parallel with triage and the specialist call
+            guardrail_task = Runner._start_input_guardrails(agent, input_data, context, api_key)
+            try:
+                # Reuse the pooled OpenAI client (and its keep-alive connections)
+                client = client_pool.get(api_key)
+                
+                # Conversation history, if the caller passed one in the context
+                memory = Runner._get_memory(context)
+                if memory is not None:
+                    await memory.wait_for_compaction()
+            
+                # Track which agent is being used
+                current_agent = await Runner._until_tripwire(
+                    Runner._select_agent(client, agent, input_data, memory), guardrail_task
+                )
+                agent_used = current_agent.name
+            
+                # Get the selected agent's answer
+                response_content = await Runner._until_tripwire(
+                    Runner._answer(client, current_agent, input_data, memory), guardrail_task
+                )
+            
+                # The answer is only released once every guardrail has passed
+                if guardrail_task is not None:
+                    await guardrail_task
+                Runner._remember(client, current_agent, memory, input_data, response_content)
+            
+                # If the agent has an output type, try to parse the response
+                if current_agent.output_type:
+                    try:
+                        parsed = validate_output(current_agent.output_type, response_content)
+                        return RunResult(
+                            final_output=dump_output(current_agent.output_type, parsed), agent_used=agent_used, usage=usage
+                        )
+                    except Exception as e:
+                        print(f"Error parsing response as {current_agent.output_type.__name__}: {e}")
+                        return RunResult(final_output=response_content, agent_used=agent_used, usage=usage)
+            
+                return RunResult(final_output=response_content, agent_used=agent_used, usage=usage)
+            except InputGuardrailTripwireTriggered:
+                return RunResult(final_output=GUARDRAIL_REJECTION_MESSAGE, agent_used="Guardrail", usage=usage)
+            finally:
+                Runner._stop_input_guardrails(guardrail_task)
 
-frontend_architect_agent = Agent(
-    name="Frontend Architect",
-    handoff_description="Specialist agent for frontend architecture and UI/UX design.",
-    instructions="You are the Frontend Architect. You define the overall structure, design patterns, and technology stack for the client-side of web applications. Focus on creating responsive, accessible, and performant user interfaces. Guide on frontend frameworks, component libraries, state management, and build processes. Explain your reasoning for architectural decisions and provide examples of best practices.",
-)
+    @staticmethod
+    async def run_fanout(
+        agent: Agent,
+        input_data: str,
+        k: int = 3,
+        deadline: float = 60.0,
+        synthesize: bool = True,
+        context: Optional[Dict] = None,
+        api_key: Optional[str] = None
+    ):
+        """
+        Ask up to k specialists at once and merge their answers.
 
-backend_architect_agent = Agent(
-    name="Backend Architect",
-    handoff_description="Specialist agent for backend architecture and server-side logic.",
-    instructions="You are the Backend Architect. You design the application's server-side architecture, choose appropriate languages, frameworks, and server technologies. Define how the application processes requests, manages data, and interacts with other services. Prioritize scalability, reliability, and maintainability. Explain your architectural choices and provide examples of robust backend designs.",
-)
+        Args:
+            agent: The triage agent whose handoffs are consulted
+            input_data: The user's input message
+            k: Maximum number of specialists to consult
+            deadline: Seconds for the whole request; specialists still running when it
+                expires are cancelled and left out of the answer
+            synthesize: Merge the answers with an LLM call instead of listing them one after another
+            context: Optional context information
+            api_key: OpenAI API key for this request (defaults to OPENAI_API_KEY)
 
-database_architect_agent = Agent(
-    name="Database Architect",
-    handoff_description="Specialist agent for database design and data management.",
-    instructions="You are the Database Architect. You design and implement database schemas, choose the right database technology, and define data access patterns. Ensure data integrity, performance, scalability, and security. Advise on data modeling, query optimization, and database management strategies. Explain your database design rationale and provide examples of efficient data management.",
-)
+        Returns:
+            RunResult with the merged answer; agent_used lists the specialists that answered
+        """
+        try:
+            return await Runner._run_fanout(agent, input_data, k, deadline, synthesize, context, api_key)
+        except Exception as e:
+            print(f"Error in Runner.run_fanout: {e}")
+            return RunResult(final_output=f"Error: {str(e)}", agent_used="Error")
 
-api_architect_agent = Agent(
-    name="API Architect",
-    handoff_description="Specialist agent for API design and integration.",
-    instructions="You are the API Architect. You design and document application programming interfaces (APIs), ensuring they are well-defined, secure, and easy to use. Decide on API styles, data formats, and authentication mechanisms. Create robust and efficient communication channels. Explain your API design principles and provide examples of well-structured APIs.",
-)
+    @staticmethod
+    async def _run_fanout(
+        agent: Agent,
+        input_data: str,
+        k: int,
+        deadline: float,
+        synthesize: bool,
+        context: Optional[Dict],
+        api_key: Optional[str] = None
+    ):
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        with span("run", agent=agent.name, fanout=k), track_usage(Runner._get_session_usage(context)) as usage:
+            guardrail_task = Runner._start_input_guardrails(agent, input_data, context, api_key)
+            tasks = {}
+            try:
+                client = client_pool.get(api_key)
+                memory = Runner._get_memory(context)
+                if memory is not None:
+                    await memory.wait_for_compaction()
 
-security_architect_agent = Agent(
-    name="Security Architect",
-    handoff_description="Specialist agent for web application security.",
-    instructions="You are the Security Architect. You identify potential security risks, design security measures, and ensure security best practices are followed. Advise on authentication, authorization, data encryption, and protection against common web attacks. Explain your security recommendations and provide examples of secure coding practices.",
-)
+                try:
+                    specialists = await Runner._until_tripwire(
+                        asyncio.wait_for(Runner._rank_agents(client, agent, input_data, k, memory), deadline), guardrail_task
+                    )
+                except asyncio.TimeoutError:
+                    # wait_for's own TimeoutError has no message, which would leave "Error: " for the caller
+                    raise TimeoutError(f"Triage did not pick the specialists within the {deadline:g}s deadline")
 
-devops_architect_agent = Agent(
-    name="DevOps Architect",
-    handoff_description="Specialist agent for development, deployment, and operations processes.",
-    instructions="You are the DevOps Architect. You design and implement CI/CD pipelines, infrastructure automation, and monitoring systems. Focus on improving the efficiency, speed, and reliability of the software delivery process. Explain your DevOps strategies and provide examples of effective automation techniques.",
-)
+                # All specialists are asked concurrently; whoever misses the deadline is cancelled
+                tasks = {
+                    asyncio.create_task(Runner._answer(client, specialist, input_data, memory)): specialist
+                    for specialist in specialists
+                }
+                done, _ = await Runner._until_tripwire(
+                    asyncio.wait(tasks, timeout=max(0.0, expires_at - loop.time())), guardrail_task
+                )
+                # In ranking order, best first
+                answered = [
+                    (specialist, task.result())
+                    for task, specialist in tasks.items()
+                    if task in done and task.exception() is None
+                ]
+                answers = [(specialist.name, answer) for specialist, answer in answered]
+                if not answers:
+                    raise TimeoutError("No specialist answered before the deadline")
 
-scalability_architect_agent = Agent(
-    name="Scalability Architect",
-    handoff_description="Specialist agent for application scalability.",
-    instructions="You are the Scalability Architect. You design the application architecture to handle increasing user traffic and data loads without compromising performance or stability. Consider horizontal and vertical scaling, load balancing, and caching. Explain your scalability strategies and provide examples of scalable system designs.",
-)
+                if guardrail_task is not None:
+                    await guardrail_task
 
-performance_architect_agent = Agent(
-    name="Performance Architect",
-    handoff_description="Specialist agent for application performance optimization.",
-    instructions="You are the Performance Architect. You identify performance bottlenecks, recommend optimization techniques, and ensure the application meets required performance metrics. Advise on code optimization, database query tuning, and efficient resource utilization. Explain your performance optimization recommendations and provide examples of performance best practices.",
-)
+                if len(answers) == 1:
+                    output = answers[0][1]
+                elif synthesize:
+                    try:
+                        output = await asyncio.wait_for(
+                            Runner._synthesize(client, input_data, answers), max(0.0, expires_at - loop.time())
+                        )
+                    except Exception as e:
+                        # Still answer, just without the merge step
+                        print(f"Error synthesizing answers: {e or type(e).__name__}")
+                        output = Runner._concatenate(answers)
+                else:
+                    output = Runner._concatenate(answers)
 
-cloud_architect_agent = Agent(
-    name="Cloud Architect",
-    handoff_description="Specialist agent for cloud infrastructure and services.",
-    instructions="You are the Cloud Architect. You design and implement the application's infrastructure using cloud services. Choose appropriate cloud resources, manage costs, and ensure the application leverages cloud benefits like scalability and reliability. Explain your cloud architecture decisions and provide examples of effective cloud resource utilization.",
-)
+                # Follow-ups are routed as continuing the best-ranked specialist that answered
+                Runner._remember(client, answered[0][0], memory, input_data, output)
+                return RunResult(final_output=output, agent_used=", ".join(name for name, _ in answers), usage=usage)
+            except InputGuardrailTripwireTriggered:
+                return RunResult(final_output=GUARDRAIL_REJECTION_MESSAGE, agent_used="Guardrail", usage=usage)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                Runner._stop_input_guardrails(guardrail_task)
 
-mobile_architect_agent = Agent(
-    name="Mobile Architect",
-    handoff_description="Specialist agent for mobile application architecture.",
-    instructions="You are the Mobile Architect. You design the architecture for mobile applications (native, hybrid, or PWA) that interact with the web application's backend. Consider mobile-specific challenges like offline capabilities, push notifications, and device features. Explain your mobile architecture approaches and provide examples of robust mobile designs.",
-)
+    @staticmethod
+    async def run_streamed(agent: Agent, input_data: str, context: Optional[Dict] = None, api_key: Optional[str] = None):
+        """
+        Run the agent and stream the answer as it is generated.
 
-llm_application_architect_agent = Agent(
-    name="LLM Application Architect",
-    handoff_description="Specialist agent for integrating Large Language Models into web applications.",
-    instructions="You are the LLM Application Architect. You design the architecture of web applications that leverage Large Language Models for various functionalities. You determine how LLMs will be integrated with other components, considering factors like data flow, user interaction, and cost efficiency. Explain your integration strategies and provide examples of effective LLM application designs.",
-)
+        Args:
+            agent: The agent to run
+            input_data: The user's input message
+            context: Optional context information
+            api_key: OpenAI API key for this request (defaults to OPENAI_API_KEY)
 
-llm_tooling_architect_agent = Agent(
-    name="LLM Tooling Architect",
-    handoff_description="Specialist agent for designing and building tools for Large Language Models.",
-    instructions="You are the LLM Tooling Architect. You design and develop tools that extend the capabilities of Large Language Models. This includes creating functions, APIs, or other mechanisms that allow LLMs to interact with external systems, access specific data, or perform specialized tasks. Explain your tool design principles and provide examples of useful LLM tools.",
-)
+        Yields:
+            StreamEvent objects carrying the next text delta and which agent is answering.
+            The first event has an empty delta and is emitted as soon as the agent is selected;
+            the last one carries the request's token usage.
+        """
+        session_usage = Runner._get_session_usage(context)
+        # Created inside the first step, so a stream started within another run joins its ledger
+        usage = None
+        steps = None
+        spans = SpanSteps()
+        try:
+            while True:
+                # The ledger and the open spans are only active while the stream runs, never while
+                # the caller holds an event, so they cannot leak into the caller's later runs or spans
+                with track_usage(session_usage, request=usage) as usage, spans:
+                    if steps is None:
+                        steps = Runner._run_streamed(agent, input_data, context, api_key, usage)
+                    try:
+                        event = await steps.__anext__()
+                    except StopAsyncIteration:
+                        return
+                yield event
+        finally:
+            if steps is not None:
+                with track_usage(session_usage, request=usage), spans:
+                    await steps.aclose()
 
-mcp_server_architect_agent = Agent(
-    name="MCP Server Architect",
-    handoff_description="Specialist agent for designing and implementing Model Context Protocol servers.",
-    instructions="You are the MCP Server Architect. You design and implement servers that adhere to the Model Context Protocol. This involves defining how context is managed, shared, and updated between different parts of the application and the Large Language Model. Ensure the server is scalable, reliable, and efficient in handling context. Explain your MCP server design choices and provide details on its implementation.",
-)
+    @staticmethod
+    async def _run_streamed(
+        agent: Agent, input_data: str, context: Optional[Dict], api_key: Optional[str], usage: UsageLedger
+    ):
+        """Body of run_streamed; must be stepped with the request's usage ledger active."""
+        with span("run", agent=agent.name, streamed=True):
+            # Guardrails run in parallel; deltas are held back until they pass
+            guardrail_task = Runner._start_input_guardrails(agent, input_data, context, api_key)
+            try:
+                client = client_pool.get(api_key)
 
-prompt_engineering_architect_agent = Agent(
-    name="Prompt Engineering Architect",
-    handoff_description="Specialist agent for designing effective prompts for Large Language Models.",
-    instructions="You are the Prompt Engineering Architect. You specialize in crafting effective and efficient prompts that guide Large Language Models to produce desired outputs. This includes understanding different prompting techniques, designing prompt templates, and optimizing prompts for specific tasks and models. Explain your prompt design strategies and provide examples of well-engineered prompts.",
-)
+                memory = Runner._get_memory(context)
+                if memory is not None:
+                    await memory.wait_for_compaction()
 
-llm_data_architect_agent = Agent(
-    name="LLM Data Architect",
-    handoff_description="Specialist agent for managing and preparing data for Large Language Models.",
-    instructions="You are the LLM Data Architect. You are responsible for the data pipelines and storage solutions required for training and using Large Language Models. This includes data collection, cleaning, preprocessing, and formatting to ensure high-quality data for the LLMs. Explain your data management strategies and provide examples of effective data preparation techniques for LLMs.",
-)
+                current_agent = await Runner._until_tripwire(
+                    Runner._select_agent(client, agent, input_data, memory), guardrail_task
+                )
+                agent_used = current_agent.name
+                yield StreamEvent(delta="", agent_used=agent_used)
 
-llm_fine_tuning_architect_agent = Agent(
-    name="LLM Fine-tuning Architect",
-    handoff_description="Specialist agent for fine-tuning Large Language Models for specific tasks.",
-    instructions="You are the LLM Fine-tuning Architect. You design and oversee the process of fine-tuning pre-trained Large Language Models on specific datasets to improve their performance on targeted tasks. This includes selecting appropriate datasets, defining fine-tuning parameters, and evaluating the results. Explain your fine-tuning methodologies and provide examples of successful fine-tuning strategies.",
-)
+                # A cached answer is sent as a single delta
+                use_cache = Runner._use_response_cache(memory)
+                cached_output = await response_cache.get(current_agent, input_data) if use_cache else None
+                if cached_output is not None:
+                    if guardrail_task is not None:
+                        await guardrail_task
+                    Runner._remember(client, current_agent, memory, input_data, cached_output)
+                    yield StreamEvent(delta=cached_output, agent_used=agent_used, usage=usage)
+                    return
+
+                with span("specialist", agent=agent_used, streamed=True) as specialist_span:
+                    messages = Runner._build_messages(current_agent, input_data, memory)
+                    generation_kwargs = Runner._generation_kwargs(current_agent)
+                    deltas = []
+                    held_back = 0
+                    completion_tokens = 0
+                    continued = False
+                    while True:
+                        # Call the OpenAI API with streaming enabled and forward each token delta.
+                        # Only opening the stream is retried; a stream that stalls midway is abandoned.
+                        stream = await Runner._until_tripwire(
+                            complete(
+                                client.chat.completions.create,
+                                Runner._models(current_agent),
+                                specialist_policy,
+                                hedge=False,
+                                key=agent_used,
+                                messages=messages,
+                                **generation_kwargs,
+                                stream=True,
+                                stream_options={"include_usage": True}
+                            ),
+                            guardrail_task
+                        )
+                        finish_reason = None
+                        chunks = stream.__aiter__()
+                        while True:
+                            try:
+                                chunk = await Runner._until_tripwire(
+                                    asyncio.wait_for(chunks.__anext__(), specialist_policy.timeout), guardrail_task
+                                )
+                            except StopAsyncIteration:
+                                break
+                            # The final chunk carries the token usage of the whole stream
+                            if chunk.usage is not None:
+                                specialist_span.record_usage(chunk)
+                                record_usage(agent_used, chunk)
+                                completion_tokens += chunk.usage.completion_tokens
+                            if chunk.choices and chunk.choices[0].finish_reason:
+                                finish_reason = chunk.choices[0].finish_reason
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if not deltas:
+                                    specialist_span.set_attribute("time_to_first_token_ms", round(specialist_span.duration_ms, 3))
+                                deltas.append(chunk.choices[0].delta.content)
+                                if guardrail_task is not None and not guardrail_task.done():
+                                    held_back += 1
+                                    continue
+                                # Guardrails have passed: flush anything held back, then stream directly
+                                yield StreamEvent(delta="".join(deltas[len(deltas) - held_back - 1:]), agent_used=agent_used)
+                                held_back = 0
+
+                        if finish_reason != "length":
+                            break
+                        completion_budget.record_truncation(agent_used)
+                        configured_max_tokens = effective_settings(current_agent).max_tokens
+                        if continued or generation_kwargs.get("max_tokens") == configured_max_tokens:
+                            break
+                        # Cut off by the adaptive limit. What was streamed cannot be taken back,
+                        # so the answer is continued with the rest of the configured limit.
+                        specialist_span.set_attribute("truncated_at", generation_kwargs["max_tokens"])
+                        continued = True
+                        messages = messages + [
+                            {"role": "assistant", "content": "".join(deltas)},
+                            {"role": "user", "content": CONTINUE_PROMPT},
+                        ]
+                        generation_kwargs = {
+                            **generation_kwargs,
+                            "max_tokens": max(configured_max_tokens - completion_tokens, completion_budget.floor),
+                        }
+
+                    if completion_tokens:
+                        completion_budget.observe(agent_used, completion_tokens)
+                    if guardrail_task is not None:
+                        await guardrail_task
+                    if held_back:
+                        yield StreamEvent(delta="".join(deltas[len(deltas) - held_back:]), agent_used=agent_used)
+
+                # Only complete answers are cached and remembered
+                if use_cache:
+                    response_cache.set(current_agent, input_data, "".join(deltas))
+                Runner._remember(client, current_agent, memory, input_data, "".join(deltas))
+                yield StreamEvent(delta="", agent_used=agent_used, usage=usage)
+            except InputGuardrailTripwireTriggered:
+                yield StreamEvent(delta=GUARDRAIL_REJECTION_MESSAGE, agent_used="Guardrail", usage=usage)
+            except Exception as e:
+                print(f"Error in Runner.run_streamed: {e}")
+                yield StreamEvent(delta=f"Error: {str(e)}", agent_used="Error", usage=usage)
+            finally:
+                Runner._stop_input_guardrails(guardrail_task)
+
+    @staticmethod
+    async def run_batch(
+        agent: Agent,
+        inputs: List[str],
+        concurrency: int = 8,
+        max_retries: int = 5,
+        context: Optional[Dict] = None,
+        api_key: Optional[str] = None
+    ):
+        """
+        Run the agent over many inputs with bounded concurrency.
+
+        Args:
+            agent: The agent to run
+            inputs: The input messages
+            concurrency: Maximum number of inputs in flight at once
+            max_retries: How many times an input is retried after a rate limit error
+            context: Optional context information shared by every run
+            api_key: OpenAI API key for the batch (defaults to OPENAI_API_KEY)
+
+        Yields:
+            BatchItem objects in completion order (not input order).
+        """
+        from openai import RateLimitError
+
+        semaphore = asyncio.Semaphore(concurrency)
+        backoff = RateLimitBackoff()
+
+        async def run_one(index: int, input_data: str) -> BatchItem:
+            async with semaphore:
+                start = time.perf_counter()
+                for attempt in range(1, max_retries + 2):
+                    # Every worker pauses while the batch is being rate limited
+                    await backoff.wait()
+                    try:
+                        # Rate limits come straight here, so every worker backs off together
+                        result = await Runner._run(agent, input_data, context, api_key, retry_rate_limits=False)
+                        backoff.on_success()
+                        break
+                    except RateLimitError as e:
+                        if attempt > max_retries:
+                            result = RunResult(final_output=f"Error: {str(e)}", agent_used="Error")
+                            break
+                        backoff.on_rate_limit(retry_after_seconds(e))
+                    except Exception as e:
+                        result = RunResult(final_output=f"Error: {str(e)}", agent_used="Error")
+                        break
+                return BatchItem(index, input_data, result, time.perf_counter() - start, attempt)
+
+        tasks = [asyncio.create_task(run_one(i, input_data)) for i, input_data in enumerate(inputs)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+# Output types live in outputs.py, which imports pydantic, and are loaded on first use
+OUTPUT_TYPES = ("WebdevOutput",)
 
 # Define guardrail function
 async def webdev_guardrail(ctx, agent, input_data):
-    result = await Runner.run(guardrail_agent, input_data, context=ctx.context)
+    from outputs import WebdevOutput
+
+    result = await Runner.run(get_agent("guardrail_agent"), input_data, context=ctx.context, api_key=ctx.api_key)
     final_output = result.final_output_as(WebdevOutput)
     return GuardrailFunctionOutput(
         output_info=final_output,
         tripwire_triggered=not final_output.is_webdev,
     )
 
-# Define triage agent
-triage_agent = Agent(
-    name="Triage Agent",
-    instructions="You determine which agent to use based on the user's web development question",
-    handoffs=[frontend_architect_agent,
-              backend_architect_agent,
-              database_architect_agent,
-              api_architect_agent,
-              security_architect_agent,
-              devops_architect_agent,
-              scalability_architect_agent,
-              performance_architect_agent,
-              cloud_architect_agent,
-              mobile_architect_agent,
-              llm_application_architect_agent,
-              llm_tooling_architect_agent,
-              mcp_server_architect_agent,
-              prompt_engineering_architect_agent,
-              llm_data_architect_agent,
-              llm_fine_tuning_architect_agent],
-    input_guardrails=[
-        InputGuardrail(guardrail_function=webdev_guardrail),
-    ],
-)
\ No newline at end of file
+# Agents are declared in agents.json (or AGENT_SPEC) and only built when first used
+agent_registry = AgentRegistry(
+    os.environ.get("AGENT_SPEC") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents.json"),
+    factory=Agent,
+    namespace=globals(),
+)
+
+def get_agent(name: str) -> Agent:
+    """Return an agent by variable name (e.g. "triage_agent") or display name."""
+    return agent_registry.get(name)
+
+def __getattr__(name: str):
+    # Keeps `from agents import WebdevOutput` working without importing pydantic up front
+    if name in OUTPUT_TYPES:
+        import outputs
+        return getattr(outputs, name)
+    # Makes `from agents import triage_agent` build the agent on first import
+    if agent_registry.has(name):
+        return agent_registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + list(OUTPUT_TYPES) + agent_registry.keys())
@@ -1,8 +1,9 @@
-import gradio as gr
 import asyncio
 import os
 from dotenv import load_dotenv
-from agents import Runner, triage_agent, trace
+from agents import Runner, RunResult, triage_agent, trace
+from memory import ConversationMemory
+from usage import UsageLedger
 
 # Load environment variables from .env file if it exists
 load_dotenv()
@@ -15,26 +16,120 @@ if not api_key:
     print("No API key found in environment variables or .env file.")
     print("Please add your API key to the .env file or enter it in the web interface.")
 
-async def chat_response(message, history=None, key=None):
-    """Process the user's message and return a response from the OpenAI API."""
+# Queue settings: requests handled at once per event, and requests waiting before new ones are turned away
+CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", "32"))
+QUEUE_SIZE = int(os.environ.get("GRADIO_QUEUE_SIZE", "256"))
+# Questions one browser session may have in flight at once
+SESSION_MAX_IN_FLIGHT = int(os.environ.get("SESSION_MAX_IN_FLIGHT", "1"))
+
+BUSY_MESSAGE = "Please wait for your previous question to be answered before asking another one."
+
+
+class SessionLimiter:
+    """Caps the number of requests each session has in flight, so one user cannot take every worker slot."""
+
+    def __init__(self, max_in_flight: int = 1):
+        self.max_in_flight = max_in_flight
+        self.in_flight = {}
+
+    def acquire(self, session: str) -> bool:
+        if self.in_flight.get(session, 0) >= self.max_in_flight:
+            return False
+        self.in_flight[session] = self.in_flight.get(session, 0) + 1
+        return True
+
+    def release(self, session: str):
+        self.in_flight[session] -= 1
+        if not self.in_flight[session]:
+            del self.in_flight[session]
+
+
+session_limiter = SessionLimiter(SESSION_MAX_IN_FLIGHT)
+
+
+def resolve_api_key(key=None):
+    """The session's API key if one was entered, otherwise the server's OPENAI_API_KEY."""
+    if key and key.strip():
+        return key.strip()
+    return os.environ.get("OPENAI_API_KEY") or None
+
+def run_context(memory=None, usage=None):
+    """Runner context holding the session's conversation memory and usage ledger, if any."""
+    context = {}
+    if memory is not None:
+        context["memory"] = memory
+    if usage is not None:
+        context["usage"] = usage
+    return context or None
+
+def usage_summary(usage, last_tokens=0, last_cost=0.0):
+    """Text for the usage box: the last question's tokens and cost, then the session's per agent."""
+    return f"Last question: {last_tokens:,} tokens, ~${last_cost:.4f}\nThis session: {usage.summary()}"
+
+async def chat_response(message, history=None, key=None, memory=None, usage=None):
+    """Process the user's message and return a response from the OpenAI API.
+
+    Pass the session's ConversationMemory as `memory` to answer with the earlier turns in context,
+    and a UsageLedger as `usage` to add the tokens and cost of the answer to it.
+    """
     try:
-        # Set the API key in the environment if provided
-        if key and key.strip():
-            os.environ["OPENAI_API_KEY"] = key.strip()
+        # The key is passed along with the request rather than set process-wide,
+        # so concurrent sessions each use their own
+        session_key = resolve_api_key(key)
         
         # Check if API key is set
-        if not os.environ.get("OPENAI_API_KEY"):
+        if not session_key:
             return "Error: OpenAI API key is not set. Please enter your API key in the field below.", "No agent used"
         
         # Call the Runner with the triage agent
         with trace("Triage workflow"):
-            result = await Runner.run(triage_agent, message)
+            context = run_context(memory, usage)
+            result = await Runner.run(triage_agent, message, context=context, api_key=session_key)
         return result
     except Exception as e:
         print(f"Error in chat_response: {e}")
         return RunResult(final_output=f"Error: {str(e)}", agent_used="Error")
 
+async def chat_response_stream(message, history=None, key=None, memory=None, fanout=False, usage=None):
+    """Process the user's message and stream the response from the OpenAI API.
+
+    Yields (partial_response, agent_used) tuples as new tokens arrive. With
+    `fanout`, several specialists answer concurrently and the merged answer is
+    yielded once.
+    """
+    try:
+        # Use this session's key for the whole request
+        session_key = resolve_api_key(key)
+
+        # Check if API key is set
+        if not session_key:
+            yield "Error: OpenAI API key is not set. Please enter your API key in the field below.", "No agent used"
+            return
+
+        # Ask several specialists and merge their answers
+        if fanout:
+            with trace("Fan-out workflow"):
+                context = run_context(memory, usage)
+                result = await Runner.run_fanout(triage_agent, message, context=context, api_key=session_key)
+            yield result.final_output, result.agent_used
+            return
+
+        # Stream from the Runner with the triage agent, accumulating the deltas
+        with trace("Triage workflow"):
+            partial_response = ""
+            context = run_context(memory, usage)
+            async for event in Runner.run_streamed(triage_agent, message, context=context, api_key=session_key):
+                partial_response += event.delta
+                yield partial_response, event.agent_used
+    except Exception as e:
+        print(f"Error in chat_response_stream: {e}")
+        yield f"Error: {str(e)}", "Error"
+
 if __name__ == "__main__":
+    # Gradio takes seconds to import, so it is only loaded when the UI is launched
+    # (importing this module for chat_response, e.g. from the load benchmark, stays fast)
+    import gradio as gr
+
     print("Starting WebDev Chat application...")
     try:
         # Create a simple Gradio chat interface
@@ -57,11 +152,20 @@ if __name__ == "__main__":
                 # Left column for chat
                 with gr.Column(scale=3):
                     chatbot = gr.Chatbot(height=500)
+                    # Token-budgeted conversation history, one per browser session
+                    memory = gr.State(ConversationMemory)
+                    # Tokens and estimated cost of the session's answers, per agent
+                    usage = gr.State(UsageLedger)
                     msg = gr.Textbox(placeholder="Ask a question about web development...", container=False)
                     
                     with gr.Row():
                         submit_btn = gr.Button("Send", variant="primary")
                         clear_btn = gr.Button("Clear", variant="secondary")
+                    fanout_checkbox = gr.Checkbox(
+                        label="Ask multiple specialists",
+                        value=False,
+                        info="Consult up to three relevant specialists at once and merge their answers."
+                    )
                 
                 # Right column for agent information
                 with gr.Column(scale=1):
@@ -71,6 +175,12 @@ if __name__ == "__main__":
                         value="No agent used yet",
                         interactive=False
                     )
+                    usage_info = gr.Textbox(
+                        label="Tokens and estimated cost",
+                        value="No questions asked yet",
+                        lines=4,
+                        interactive=False
+                    )
                     
                     # Add descriptions of available agents
                     gr.Markdown("### Available Agents")
@@ -80,17 +190,16 @@ if __name__ == "__main__":
                     agent_descriptions += "</ul>"
                     gr.Markdown(agent_descriptions)
             
-            # Function to save the API key to both environment and .env file
+            # Function to save the API key to the .env file
             def save_api_key(key):
                 if key and key.strip():
-                    # Save to environment variable for current session
-                    os.environ["OPENAI_API_KEY"] = key.strip()
-                    
+                    # The key field already holds the key for this session; the
+                    # process environment is shared by every session, so it is left alone
                     try:
                         # Save to .env file for persistence
                         with open('.env', 'w') as f:
                             f.write(f"OPENAI_API_KEY={key.strip()}")
-                        return "API key saved successfully to .env file!"
+                        return "API key saved successfully to .env file! It will be the default key after a restart."
                     except Exception as e:
                         print(f"Error saving to .env file: {e}")
                         return "API key saved to session only. Could not save to .env file."
@@ -107,37 +216,56 @@ if __name__ == "__main__":
                 chat_history.append((message, ""))
                 return "", chat_history
             
-            async def bot_response(chat_history, key):
+            async def bot_response(chat_history, key, memory, fanout, usage, request: gr.Request):
                 if not chat_history:
-                    return chat_history, "No agent used"
+                    yield chat_history, "No agent used", gr.update()
+                    return
                 
                 # Get the last user message
                 last_user_message = chat_history[-1][0]
+
+                # Turn the question away if this session already has one in flight
+                session = request.session_hash if request is not None else None
+                if not session_limiter.acquire(session):
+                    chat_history[-1] = (last_user_message, BUSY_MESSAGE)
+                    yield chat_history, "No agent used", gr.update()
+                    return
                 
-                # Get response from the agent using the provided API key
-                run_result = await chat_response(last_user_message, None, key)
-                
-                # Update the last message in chat history with the response
-                chat_history[-1] = (last_user_message, run_result.final_output)
-                return chat_history, f"{run_result.agent_used}"
+                try:
+                    tokens_before, cost_before = usage.total.total_tokens, usage.total.cost
+                    # Stream the response from the agent using the provided API key,
+                    # updating the last message in chat history as tokens arrive
+                    async for partial_response, agent_used in chat_response_stream(last_user_message, None, key, memory, fanout, usage):
+                        chat_history[-1] = (last_user_message, partial_response)
+                        yield chat_history, f"{agent_used}", gr.update()
+                    yield chat_history, gr.update(), usage_summary(
+                        usage, usage.total.total_tokens - tokens_before, usage.total.cost - cost_before
+                    )
+                finally:
+                    session_limiter.release(session)
             
             # Set up the message submission flow
             msg.submit(
                 respond, [msg, chatbot, api_key_input], [msg, chatbot]
             ).then(
-                bot_response, [chatbot, api_key_input], [chatbot, agent_info]
+                bot_response, [chatbot, api_key_input, memory, fanout_checkbox, usage], [chatbot, agent_info, usage_info]
             )
             
             # Set up the button click events
             submit_btn.click(
                 respond, [msg, chatbot, api_key_input], [msg, chatbot]
             ).then(
-                bot_response, [chatbot, api_key_input], [chatbot, agent_info]
+                bot_response, [chatbot, api_key_input, memory, fanout_checkbox, usage], [chatbot, agent_info, usage_info]
             )
             
             # Clear button functionality
-            clear_btn.click(lambda: (None, None, "No agent used"), None, [msg, chatbot, agent_info])
+            # The usage ledger is kept, so the session's cost still adds up after clearing the chat
+            clear_btn.click(lambda: (None, None, "No agent used", ConversationMemory()), None, [msg, chatbot, agent_info, memory])
         
+        # Queue requests so many sessions can be served by one process; once the
+        # queue is full, new requests are rejected instead of piling up
+        demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=QUEUE_SIZE)
+
         # Launch the Gradio interface
         print("Launching Gradio interface...")
         demo.launch(
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Linearly interpolated percentile (`pct` in 0-100) of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class RateLimitBackoff:
+    """
+    Backoff shared by every worker of a batch.
+
+    A 429 pauses all workers (not just the one that was rate limited) until
+    the Retry-After time, or an exponentially growing delay with jitter. Each
+    success shrinks the delay again, so throughput recovers once the rate
+    limit clears.
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = base_delay
+        self.resume_at = 0.0
+        self.rate_limited = 0
+
+    async def wait(self):
+        remaining = self.resume_at - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    def on_rate_limit(self, retry_after: Optional[float] = None):
+        self.rate_limited += 1
+        delay = retry_after if retry_after else self.delay * random.uniform(0.5, 1.5)
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+        self.delay = min(self.delay * 2, self.max_delay)
+
+    def on_success(self):
+        self.delay = max(self.delay / 2, self.base_delay)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The Retry-After header of a rate limit error, if the server sent one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchItem:
+    def __init__(self, index: int, input_data: str, result: Any, latency: float, attempts: int):
+        self.index = index
+        self.input_data = input_data
+        self.result = result
+        self.latency = latency
+        self.attempts = attempts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "input": self.input_data,
+            "agent_used": self.result.agent_used,
+            "output": self.result.final_output,
+            "latency_s": round(self.latency, 4),
+            "attempts": self.attempts,
+        }
+
+
+class BatchReport:
+    """Throughput and per-agent latency percentiles for a finished batch."""
+
+    def __init__(self):
+        self.items: List[BatchItem] = []
+        self.start_time = time.perf_counter()
+        self.end_time: Optional[float] = None
+
+    def add(self, item: BatchItem):
+        self.items.append(item)
+        self.end_time = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (self.end_time or time.perf_counter()) - self.start_time
+        latencies = defaultdict(list)
+        for item in self.items:
+            latencies[item.result.agent_used].append(item.latency)
+            latencies["all"].append(item.latency)
+        return {
+            "requests": len(self.items),
+            "errors": sum(item.result.agent_used == "Error" for item in self.items),
+            "retries": sum(item.attempts - 1 for item in self.items),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(self.items) / elapsed, 3) if elapsed else 0.0,
+            "latency_s": {
+                agent: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 50), 3),
+                    "p95": round(percentile(values, 95), 3),
+                    "p99": round(percentile(values, 99), 3),
+                }
+                for agent, values in sorted(latencies.items())
+            },
+        }
+
+    def format(self) -> str:
+        summary = self.summary()
+        lines = [
+            f"{summary['requests']} requests in {summary['elapsed_s']}s "
+            f"({summary['throughput_rps']} req/s), {summary['errors']} errors, {summary['retries']} retries",
+            f"{'agent':<32} {'count':>5} {'p50':>8} {'p95':>8} {'p99':>8}",
+        ]
+        for agent, stats in summary["latency_s"].items():
+            lines.append(
+                f"{agent:<32} {stats['count']:>5} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}"
+            )
+        return "\n".join(lines)
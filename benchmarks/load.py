@@ -0,0 +1,228 @@
+"""
+Offline load benchmark for the agent pipeline.
+
+Starts the mock OpenAI server (benchmarks/mock_openai.py) in a subprocess,
+points the app at it, and drives one of the entry points with an increasing
+number of concurrent sessions, reporting throughput, p50/p95/p99 latency and
+memory per concurrency level. No API credits are used.
+
+Targets:
+    runner  Runner.run(triage_agent, ...)
+    stream  Runner.run_streamed(triage_agent, ...); also reports time to first token
+    chat    app.chat_response, the Gradio handler (requires gradio to be installed)
+
+Usage:
+    python -m benchmarks.load --target runner --levels 1,8,32 --requests 64
+    python -m benchmarks.load --json results.json
+    python -m benchmarks.load --baseline results.json --max-regression 0.2
+
+With --baseline, the run fails (exit code 1) if p95 latency or throughput at
+any level regresses by more than --max-regression relative to the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.mock_openai import add_server_arguments
+
+# The app is configured through the environment, so it is only imported once that is set up
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "router_queries.jsonl")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(args) -> subprocess.Popen:
+    port = free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--token-rate", str(args.token_rate), "--completion-tokens", str(args.completion_tokens),
+        "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # wait until it is listening
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    return process
+
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def make_target(name: str):
+    """Return an async callable(query) -> (ok, time_to_first_token or None)."""
+    from agents import Runner, triage_agent
+
+    if name == "runner":
+        async def run(query):
+            result = await Runner.run(triage_agent, query)
+            return result.agent_used != "Error", None
+    elif name == "stream":
+        async def run(query):
+            start = time.perf_counter()
+            first_token = None
+            agent_used = None
+            async for event in Runner.run_streamed(triage_agent, query):
+                agent_used = event.agent_used
+                if event.delta and first_token is None:
+                    first_token = time.perf_counter() - start
+            return agent_used != "Error", first_token
+    elif name == "chat":
+        try:
+            import app
+        except ImportError as e:
+            raise SystemExit(f"The chat target needs the app's dependencies: {e}")
+
+        async def run(query):
+            result = await app.chat_response(query, None, os.environ["OPENAI_API_KEY"])
+            return getattr(result, "agent_used", "Error") != "Error", None
+    else:
+        raise SystemExit(f"Unknown target {name!r}")
+    return run
+
+
+async def run_level(target, queries, concurrency: int, requests: int, measure_allocations: bool):
+    """Run `requests` queries with `concurrency` sessions issuing them back to back."""
+    from batch import percentile
+
+    latencies, first_tokens = [], []
+    errors = 0
+    next_index = 0
+
+    async def session():
+        nonlocal next_index, errors
+        while next_index < requests:
+            query = queries[next_index % len(queries)]
+            next_index += 1
+            start = time.perf_counter()
+            ok, first_token = await target(query)
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+            if first_token is not None:
+                first_tokens.append(first_token)
+
+    if measure_allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    peak_alloc = tracemalloc.get_traced_memory()[1] / 2 ** 20 if measure_allocations else None
+    if measure_allocations:
+        tracemalloc.stop()
+
+    result = {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "rss_mb": rss_mb(),
+    }
+    if first_tokens:
+        result["ttft_p50_s"] = percentile(first_tokens, 50)
+        result["ttft_p95_s"] = percentile(first_tokens, 95)
+    if peak_alloc is not None:
+        result["peak_alloc_mb"] = peak_alloc
+    return result
+
+
+def compare(results, baseline, max_regression: float) -> list:
+    """Describe every level whose p95 or throughput is worse than the baseline by more than the tolerance."""
+    failures = []
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        if level["p95_s"] > before["p95_s"] * (1 + max_regression):
+            failures.append(f"c={level['concurrency']}: p95 {before['p95_s']:.3f}s -> {level['p95_s']:.3f}s")
+        if level["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            failures.append(f"c={level['concurrency']}: throughput "
+                            f"{before['throughput_rps']:.1f} -> {level['throughput_rps']:.1f} req/s")
+    return failures
+
+
+async def main(args):
+    with open(args.queries) as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    target = make_target(args.target)
+    results = {"target": args.target, "mock": {"latency": args.latency, "token_rate": args.token_rate}, "levels": []}
+
+    # One untimed request so connection setup and lazy initialization are not measured
+    await target(queries[0])
+
+    print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'ttft50':>7} {'rss MB':>7}")
+    for concurrency in [int(c) for c in args.levels.split(",")]:
+        level = await run_level(target, queries, concurrency, args.requests, args.tracemalloc)
+        results["levels"].append(level)
+        ttft = f"{level['ttft_p50_s']:7.3f}" if "ttft_p50_s" in level else f"{'-':>7}"
+        print(f"{concurrency:>5} {level['requests']:>5} {level['errors']:>4} {level['throughput_rps']:>8.1f} "
+              f"{level['p50_s']:>7.3f} {level['p95_s']:>7.3f} {level['p99_s']:>7.3f} {ttft} {level['rss_mb']:>7.1f}")
+
+    from clients import client_pool
+    await client_pool.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="runner", choices=["runner", "stream", "chat"])
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrent session counts")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="JSONL file with a \"query\" field")
+    parser.add_argument("--base-url", help="Use an already running server instead of starting the mock")
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Keep the response and routing caches enabled (off by default so every request hits the backend)")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report peak Python allocations (slower)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated relative regression")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+    os.environ["TRACE_CONSOLE"] = "0"
+    if not args.keep_caches:
+        os.environ["RESPONSE_CACHE"] = "0"
+        os.environ["ROUTING_CACHE"] = "0"
+
+    server = None
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    else:
+        server = start_mock_server(args)
+    try:
+        results = asyncio.run(main(args))
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,149 @@
+"""
+Load test for the HTTP API (server.py) against the local mock OpenAI backend.
+
+Starts the mock server and the API server (with --workers processes) in
+subprocesses, then sends requests to /v1/ask or /v1/ask/stream over pooled
+keep-alive connections at increasing concurrency. Reports throughput, latency
+percentiles and, for streams, time to first token. No API credits are used.
+
+Usage:
+    python -m benchmarks.load_server --workers 2 --levels 1,16,64 --requests 128
+    python -m benchmarks.load_server --target stream --json server.json
+    python -m benchmarks.load_server --baseline server.json --max-regression 0.2
+    python -m benchmarks.load_server --url http://127.0.0.1:8000   # an already running server
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load import DEFAULT_QUERIES, compare, free_port, run_level, start_mock_server
+from benchmarks.mock_openai import add_server_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_api_server(args) -> subprocess.Popen:
+    port = free_port()
+    env = dict(os.environ, TRACE_CONSOLE="0")
+    if not args.keep_caches:
+        env.update(RESPONSE_CACHE="0", ROUTING_CACHE="0")
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--port", str(port), "--workers", str(args.workers)],
+        cwd=ROOT, env=env,
+    )
+    args.url = f"http://127.0.0.1:{port}"
+    return process
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/healthz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("The API server did not start")
+
+
+def make_target(name: str, client: httpx.AsyncClient):
+    """Return an async callable(query) -> (ok, time_to_first_token or None)."""
+    if name == "ask":
+        async def run(query):
+            response = await client.post("/v1/ask", json={"message": query})
+            return response.status_code == 200, None
+    else:
+        async def run(query):
+            start = time.perf_counter()
+            first_token = None
+            ok = False
+            async with client.stream("POST", "/v1/ask/stream", json={"message": query}) as response:
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[len("event: "):]
+                    elif line.startswith("data: ") and event == "delta" and first_token is None:
+                        first_token = time.perf_counter() - start
+                    elif line.startswith("data: ") and event == "done":
+                        ok = response.status_code == 200 and json.loads(line[len("data: "):])["agent_used"] != "Error"
+            return ok, first_token
+    return run
+
+
+async def main(args):
+    with open(args.queries) as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+
+    # One pooled client, so requests reuse keep-alive connections like a real caller would
+    levels = [int(c) for c in args.levels.split(",")]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120.0) as client:
+        await wait_until_ready(client)
+        target = make_target(args.target, client)
+        results = {"target": args.target, "workers": args.workers,
+                   "mock": {"latency": args.latency, "token_rate": args.token_rate}, "levels": []}
+
+        # One untimed request so worker startup and connection setup are not measured
+        await target(queries[0])
+
+        print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'ttft50':>7}")
+        for concurrency in levels:
+            level = await run_level(target, queries, concurrency, args.requests, False)
+            # The RSS measured by run_level is this client's, not the server's
+            level.pop("rss_mb", None)
+            results["levels"].append(level)
+            ttft = f"{level['ttft_p50_s']:7.3f}" if "ttft_p50_s" in level else f"{'-':>7}"
+            print(f"{concurrency:>5} {level['requests']:>5} {level['errors']:>4} {level['throughput_rps']:>8.1f} "
+                  f"{level['p50_s']:>7.3f} {level['p95_s']:>7.3f} {level['p99_s']:>7.3f} {ttft}")
+
+        if args.show_metrics:
+            print((await client.get("/metrics")).text)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="ask", choices=["ask", "stream"])
+    parser.add_argument("--workers", type=int, default=1, help="API server worker processes")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrent client counts")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="JSONL file with a \"query\" field")
+    parser.add_argument("--url", help="Test an already running API server instead of starting one")
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Keep the server's response and routing caches enabled")
+    parser.add_argument("--show-metrics", action="store_true", help="Print the server's /metrics at the end")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Tolerated relative regression")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+    processes = []
+    try:
+        if not args.url:
+            # The API server inherits OPENAI_BASE_URL pointing at the mock
+            processes.append(start_mock_server(args))
+            processes.append(start_api_server(args))
+        results = asyncio.run(main(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        sys.exit(1 if failures else 0)
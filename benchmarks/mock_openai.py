@@ -0,0 +1,231 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with
+configurable latency, token rate and error injection, so the agents can be
+benchmarked without API credits. Answers are canned but shaped like the real
+thing: triage calls get the name of one of the listed agents, JSON-mode calls
+get an object matching the requested schema, and everything else gets filler
+text of the requested length.
+
+Usage:
+    python -m benchmarks.mock_openai --port 8765 --latency 0.2 --token-rate 50
+
+Then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from typing import Tuple
+
+FILLER_WORDS = (
+    "Use a layered architecture with clear module boundaries, keep state close to where it is used, "
+    "measure before optimizing, and document the tradeoffs of each decision for the team."
+).split()
+
+
+class MockOpenAIServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        latency: float = 0.1,
+        jitter: float = 0.0,
+        token_rate: float = 0.0,
+        completion_tokens: int = 200,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            latency: Seconds before the first byte of each response
+            jitter: Random extra latency, uniform in [0, jitter] seconds
+            token_rate: Generated tokens per second (0 = instant)
+            completion_tokens: Upper bound on tokens in a free-text answer (also capped by max_tokens)
+            error_rate: Fraction of requests answered with a 500
+            rate_limit_rate: Fraction of requests answered with a 429 and Retry-After
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            # HTTP/1.1 keep-alive: serve requests until the client closes the connection
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    key, value = line.decode().split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    await self._chat_completion(writer, json.loads(body or b"{}"))
+                else:
+                    self._write_json(writer, 404, {"error": {"message": f"Unknown route {method} {path}"}})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _write_json(self, writer, status: int, payload, extra_headers: str = ""):
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}[status]
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\ncontent-type: application/json\r\n"
+            f"content-length: {len(data)}\r\n{extra_headers}\r\n".encode() + data
+        )
+
+    def _write_chunk(self, writer, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _answer(self, request) -> Tuple[str, str]:
+        """The answer text and its finish reason ("length" when max_tokens cut it short)."""
+        messages = request.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = messages[-1]["content"] if messages else ""
+
+        # Triage: pick one of the listed agents, deterministically per question
+        if "Available agents:" in system:
+            listing = system.split("Available agents:", 1)[1]
+            names = re.findall(r"(?:^|,)\s*([^,:\n]+?):", listing)
+            if names:
+                return names[zlib.crc32(user.encode()) % len(names)].strip(), "stop"
+
+        # JSON mode: build an object that satisfies the requested schema
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") in ("json_object", "json_schema"):
+            schema = response_format.get("json_schema", {}).get("schema")
+            if schema is None and "JSON schema:" in system:
+                schema = json.loads(system.rsplit("JSON schema:", 1)[1].strip())
+            return json.dumps(self._sample(schema or {})), "stop"
+
+        max_tokens = request.get("max_completion_tokens") or request.get("max_tokens") or self.completion_tokens
+        count = min(self.completion_tokens, max_tokens)
+        text = " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(count))
+        return text, "length" if count < self.completion_tokens else "stop"
+
+    def _sample(self, schema):
+        kind = schema.get("type")
+        if kind == "object":
+            return {name: self._sample(prop) for name, prop in schema.get("properties", {}).items()}
+        if kind == "boolean":
+            return True
+        if kind in ("integer", "number"):
+            return 0
+        if kind == "array":
+            return []
+        return "Mock value"
+
+    async def _chat_completion(self, writer, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self._write_json(writer, 429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                             "retry-after: 1\r\n")
+            return
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._write_json(writer, 500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        text, finish_reason = self._answer(request)
+        tokens = re.findall(r"\S+\s*", text) or [text]
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": f"chatcmpl-mock{self.requests}", "created": int(time.time()), "model": request.get("model")}
+        delay = 1 / self.token_rate if self.token_rate else 0
+
+        if not request.get("stream"):
+            await asyncio.sleep(delay * len(tokens))
+            self._write_json(writer, 200, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\ntransfer-encoding: chunked\r\n\r\n")
+        for token in tokens:
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        final = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+        self._write_chunk(writer, f"data: {json.dumps(final)}\n\n".encode())
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_chunk(writer, f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n".encode())
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency (seconds)")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Tokens per second (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Tokens per free-text answer")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+
+
+async def serve(args):
+    server = await MockOpenAIServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        token_rate=args.token_rate, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+    ).start()
+    print(f"Mock OpenAI server listening on {server.base_url}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,71 @@
+"""
+Offline accuracy benchmark for the local triage router.
+
+Scores every query in a labeled JSONL file ({"query": ..., "agent": ...}) with
+LocalRouter and reports, for a sweep of confidence thresholds, how many
+queries are routed locally (coverage), how accurate those local decisions
+are, and the overall top-1 accuracy. No API calls are made.
+
+Usage:
+    python -m benchmarks.router_accuracy [--queries PATH] [--thresholds 0,0.02,0.05]
+"""
+import argparse
+import json
+import os
+import time
+
+from agents import triage_agent
+from router import LocalRouter
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "router_queries.jsonl")
+
+
+def load_queries(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labeled JSONL query set")
+    parser.add_argument("--thresholds", default="0,0.01,0.02,0.03,0.05,0.08,0.1",
+                        help="Comma-separated top-2 margin thresholds to evaluate")
+    parser.add_argument("--show-errors", action="store_true", help="Print misrouted queries")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+
+    start = time.perf_counter()
+    router = LocalRouter(triage_agent.handoffs)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Score every query once; thresholds only change which decisions are kept
+    start = time.perf_counter()
+    rankings = [router.rank(q["query"]) for q in queries]
+    per_query_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    top1_correct = sum(r[0][0].name == q["agent"] for q, r in zip(queries, rankings))
+    top3_correct = sum(q["agent"] in [a.name for a, _ in r[:3]] for q, r in zip(queries, rankings))
+
+    print(f"Queries: {len(queries)}  agents: {len(router.agents)}")
+    print(f"Router build: {build_ms:.1f} ms  scoring: {per_query_us:.0f} us/query")
+    print(f"Top-1 accuracy: {top1_correct / len(queries):.1%}  top-3 accuracy: {top3_correct / len(queries):.1%}")
+    print()
+    print(f"{'threshold':>9} {'coverage':>9} {'routed acc':>10} {'llm fallback':>12}")
+    for threshold in [float(t) for t in args.thresholds.split(",")]:
+        routed = [(q, r) for q, r in zip(queries, rankings) if r[0][1] - r[1][1] >= threshold]
+        correct = sum(r[0][0].name == q["agent"] for q, r in routed)
+        accuracy = correct / len(routed) if routed else 0.0
+        print(f"{threshold:>9.3f} {len(routed) / len(queries):>9.1%} {accuracy:>10.1%} "
+              f"{len(queries) - len(routed):>12d}")
+
+    if args.show_errors:
+        print()
+        for q, r in zip(queries, rankings):
+            if r[0][0].name != q["agent"]:
+                margin = r[0][1] - r[1][1]
+                print(f"[{margin:.3f}] {q['query']!r}: expected {q['agent']}, got {r[0][0].name}")
+
+
+if __name__ == "__main__":
+    main()
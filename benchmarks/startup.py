@@ -0,0 +1,133 @@
+"""
+Startup-time benchmark based on `python -X importtime`.
+
+Imports each entry point in a fresh interpreter several times and reports
+the median import time, the median wall time of the whole process, and which
+heavy dependencies were loaded. The CLI and the agents module should load
+without openai, numpy, pydantic or gradio; those are imported when first needed.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 10              # also list the slowest imports
+    python -m benchmarks.startup --json startup.json
+    python -m benchmarks.startup --baseline startup.json --max-regression 0.3
+
+Exits with code 1 if an entry point loads a heavy dependency it should not
+(see LAZY_DEPENDENCIES), or, with --baseline, if an import got slower than
+the baseline by more than --max-regression.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_DEPENDENCIES = ("openai", "httpx", "numpy", "gradio", "fastapi", "pydantic", "tiktoken", "yaml")
+
+# Entry points and the heavy dependencies they must not import at startup
+LAZY_DEPENDENCIES = {
+    "agents": ("openai", "httpx", "numpy", "gradio", "fastapi", "pydantic", "tiktoken", "yaml"),
+    "main": ("openai", "httpx", "numpy", "gradio", "fastapi", "pydantic", "tiktoken", "yaml"),
+    "app": ("openai", "httpx", "numpy", "gradio", "fastapi", "pydantic", "tiktoken", "yaml"),
+    "server": ("openai", "numpy", "gradio", "tiktoken", "yaml"),
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every line of -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two spaces per level after the separator's space
+        imports.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(module: str) -> Dict:
+    """Import `module` once in a fresh interpreter."""
+    # Keep the measurement independent of the caller's caches and tracing settings
+    env = dict(os.environ, TRACE_CONSOLE="0", PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    imports = parse_importtime(completed.stderr)
+    # A module is listed after everything it imports, so its direct imports are
+    # the once-indented entries since the previous top-level entry
+    direct = []
+    for name, _, cumulative in imports:
+        if not name.startswith(" "):
+            if name == module:
+                import_us = cumulative
+                break
+            direct = []
+        elif not name.startswith("   "):
+            direct.append((name.strip(), cumulative))
+    loaded = {name.strip().split(".")[0] for name, _, _ in imports}
+    return {
+        "import_ms": import_us / 1000,
+        "wall_ms": wall * 1000,
+        "heavy": sorted(loaded & set(HEAVY_DEPENDENCIES)),
+        "slowest": sorted(direct, key=lambda item: -item[1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default=",".join(LAZY_DEPENDENCIES), help="Comma-separated modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (the median is reported)")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest direct imports of each module")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.3, help="Tolerated relative regression")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    print(f"{'module':<10} {'import ms':>10} {'wall ms':>9}  heavy dependencies loaded")
+    for module in args.modules.split(","):
+        runs = [measure(module) for _ in range(args.repeat)]
+        result = {
+            "import_ms": round(statistics.median(r["import_ms"] for r in runs), 1),
+            "wall_ms": round(statistics.median(r["wall_ms"] for r in runs), 1),
+            "heavy": runs[0]["heavy"],
+        }
+        results[module] = result
+        print(f"{module:<10} {result['import_ms']:>10.1f} {result['wall_ms']:>9.1f}  {', '.join(result['heavy']) or '-'}")
+        for name, cumulative in runs[0]["slowest"][:args.top]:
+            print(f"{'':<12}{cumulative / 1000:>8.1f}  {name}")
+
+        unexpected = set(result["heavy"]) & set(LAZY_DEPENDENCIES.get(module, ()))
+        if unexpected:
+            failures.append(f"{module} imports {', '.join(sorted(unexpected))} at startup")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for module, result in results.items():
+            before = baseline.get(module)
+            if before and result["import_ms"] > before["import_ms"] * (1 + args.max_regression):
+                failures.append(f"{module}: import {before['import_ms']:.1f} ms -> {result['import_ms']:.1f} ms")
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
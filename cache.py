@@ -0,0 +1,463 @@
+import asyncio
+import atexit
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from text import STOP_WORDS, TOKEN_RE
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+class LRUCache:
+    """
+    Size-bounded LRU cache with a time-to-live per entry.
+
+    Expired entries are dropped lazily on lookup; when the cache is full the
+    least recently used entry is evicted. Hit/miss/eviction counters are kept
+    for `stats()`. `on_evict(key, value)` is called for every entry dropped
+    by eviction or expiry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry[0], time.monotonic()):
+            del self._entries[key]
+            self.expirations += 1
+            if self.on_evict is not None:
+                self.on_evict(key, entry[1])
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def touch(self, key: Hashable, default: Any = None) -> Any:
+        """The live value of `key`, marked as most recently used without counting a hit or miss."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry[0], time.monotonic()):
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, (_, evicted_value) = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
+
+    def items(self):
+        """Live (key, value) pairs, least recently used first."""
+        now = time.monotonic()
+        return [(k, v) for k, (created_at, v) in self._entries.items() if not self._expired(created_at, now)]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk store for cached responses so they survive restarts.
+
+    Rows carry their creation time (wall clock) for the TTL and a last-access
+    time used to trim the table back to `max_entries` in LRU order. Lookups
+    only read; writes (new rows, last-access times, expired rows) are queued
+    and applied by a writer thread, one transaction per batch, so callers
+    never wait for a commit. Last-access times only order the trim, so a hit
+    refreshes them at most once per `touch_interval` seconds.
+    """
+
+    TRIM = (
+        "DELETE FROM responses WHERE rowid IN ("
+        " SELECT rowid FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)"
+    )
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        ttl: Optional[float] = 3600.0,
+        touch_interval: float = 60.0,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " namespace TEXT NOT NULL, query TEXT NOT NULL, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, query))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+        # (statement, parameters) pairs for the writer thread; None stops it
+        self._writes: "queue.Queue[Optional[Tuple[str, tuple]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+        self._writer.start()
+        self._closed = False
+        # Queued writes would be lost with the daemon thread if the process exited without closing
+        atexit.register(self.close)
+
+    def get(self, namespace: str, query: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, accessed_at FROM responses WHERE namespace = ? AND query = ?",
+                (namespace, query),
+            ).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and now - row[1] > self.ttl:
+            self._writes.put(("DELETE FROM responses WHERE namespace = ? AND query = ?", (namespace, query)))
+            return None
+        if now - row[2] > self.touch_interval:
+            self._writes.put(
+                ("UPDATE responses SET accessed_at = ? WHERE namespace = ? AND query = ?", (now, namespace, query))
+            )
+        return row[0]
+
+    def set(self, namespace: str, query: str, response: str):
+        now = time.time()
+        self._writes.put(("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (namespace, query, response, now, now)))
+
+    def _write_loop(self):
+        stopped = False
+        while not stopped:
+            # Everything queued while the previous batch was being written goes in one transaction
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stopped = None in batch
+            statements = [statement for statement in batch if statement is not None]
+            try:
+                with self._lock:
+                    for sql, parameters in statements:
+                        self._conn.execute(sql, parameters)
+                    if any(sql.startswith("INSERT") for sql, _ in statements):
+                        self._conn.execute(self.TRIM, (self.max_entries,))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                # A failed write only loses cache entries; keep the thread alive for the next batch
+                print(f"Error writing the response cache: {e}")
+                with self._lock:
+                    self._conn.rollback()
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def flush(self):
+        """Wait until every queued write is on disk."""
+        self._writes.join()
+
+    def close(self):
+        """Apply the queued writes and close the file. Safe to call more than once."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._writes.put(None)
+        self._writer.join()
+        with self._lock:
+            self._conn.close()
+        atexit.unregister(self.close)
+
+
+class _VectorIndex:
+    """
+    Unit vectors of one namespace's cached queries, one per row of a matrix.
+
+    Rows freed by evicted entries are reused, and the matrix only grows (by
+    doubling, up to `limit` rows) when all of them are taken, so a lookup is
+    one matrix-vector product without copying the vectors.
+    """
+
+    def __init__(self, n_features: int, limit: int, capacity: int = 16):
+        import numpy as np
+
+        capacity = max(1, min(capacity, limit))
+        self.limit = limit
+        self.matrix = np.zeros((capacity, n_features), dtype=np.float32)
+        self.keys: List[Optional[str]] = [None] * capacity
+        self.rows: Dict[str, int] = {}
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def add(self, key: str, vector):
+        row = self.rows.get(key)
+        if row is None:
+            if not self.free:
+                self._grow()
+            row = self.free.pop()
+            self.rows[key] = row
+            self.keys[row] = key
+        self.matrix[row] = vector
+
+    def remove(self, key: str):
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.matrix[row] = 0.0
+            self.keys[row] = None
+            self.free.append(row)
+
+    def _grow(self):
+        import numpy as np
+
+        capacity = len(self.keys)
+        new_capacity = max(capacity + 1, min(capacity * 2, self.limit))
+        matrix = np.zeros((new_capacity, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:capacity] = self.matrix
+        self.matrix = matrix
+        self.keys += [None] * (new_capacity - capacity)
+        self.free = list(range(new_capacity - 1, capacity - 1, -1))
+
+    def search(self, vector, threshold: float) -> List[str]:
+        """Keys whose similarity to `vector` is at least `threshold`, most similar first."""
+        import numpy as np
+
+        scores = self.matrix @ vector
+        rows = np.flatnonzero(scores >= threshold)
+        rows = rows[np.argsort(-scores[rows])]
+        return [self.keys[row] for row in rows if self.keys[row] is not None]
+
+
+class ResponseCache:
+    """
+    Cache of final agent responses, namespaced per agent.
+
+    The namespace is the agent's name plus a hash of its instructions, so
+    editing an agent's prompt never serves answers generated by the old one.
+    Lookups try an exact match on the normalized query first, in memory and
+    then in the optional SQLite backend, then (when `similarity_threshold` is
+    set) the most similar cached query in the same namespace by cosine
+    similarity of hashed n-gram vectors.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        similarity_threshold: Optional[float] = None,
+        backend: Optional[SQLiteCacheBackend] = None,
+    ):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl, on_evict=self._evicted)
+        self.similarity_threshold = similarity_threshold
+        self.backend = backend
+        # Near-duplicate matching needs numpy, which is only imported when it is enabled
+        self.vectorizer = None
+        if similarity_threshold is not None:
+            from router import HashingVectorizer
+            self.vectorizer = HashingVectorizer(n_features=2 ** 12)
+        self._indexes: Dict[str, _VectorIndex] = {}
+        self.near_hits = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def namespace(agent) -> str:
+        digest = hashlib.sha256(agent.instructions.encode()).hexdigest()[:16]
+        return f"{agent.name}:{digest}"
+
+    def _vector(self, query: str):
+        import numpy as np
+
+        vector = self.vectorizer.transform([query])[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _store(self, namespace: str, normalized: str, response: str):
+        self.memory.set((namespace, normalized), response)
+        if self.vectorizer is not None:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _VectorIndex(self.vectorizer.n_features, self.memory.max_entries)
+            index.add(normalized, self._vector(normalized))
+
+    def _evicted(self, key, response):
+        namespace, normalized = key
+        index = self._indexes.get(namespace)
+        if index is not None:
+            index.remove(normalized)
+            if not index.rows:
+                del self._indexes[namespace]
+
+    def _nearest(self, namespace: str, normalized: str) -> Optional[str]:
+        index = self._indexes.get(namespace)
+        if index is None:
+            return None
+        for key in index.search(self._vector(normalized), self.similarity_threshold):
+            # Expired entries stay in the index until the LRU cache drops them
+            response = self.memory.touch((namespace, key))
+            if response is not None:
+                return response
+        return None
+
+    async def get(self, agent, query: str) -> Optional[str]:
+        namespace = self.namespace(agent)
+        normalized = normalize_query(query)
+
+        response = self.memory.get((namespace, normalized))
+        if response is not None:
+            return response
+
+        if self.backend is not None:
+            # Read in a worker thread, so a slow disk does not stall the event loop
+            response = await asyncio.to_thread(self.backend.get, namespace, normalized)
+            if response is not None:
+                self.disk_hits += 1
+                # Promote to memory so the next lookup is served without disk I/O
+                self._store(namespace, normalized, response)
+                return response
+
+        # Near-duplicates only when no stored answer is for this exact question
+        if self.similarity_threshold is not None:
+            response = self._nearest(namespace, normalized)
+            if response is not None:
+                self.near_hits += 1
+                return response
+        return None
+
+    def set(self, agent, query: str, response: str):
+        namespace = self.namespace(agent)
+        normalized = normalize_query(query)
+        self._store(namespace, normalized, response)
+        if self.backend is not None:
+            # Only queued; the backend's writer thread commits it
+            self.backend.set(namespace, normalized, response)
+
+    def close(self):
+        """Write out what the disk backend still has queued."""
+        if self.backend is not None:
+            self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats["exact_hits"] = stats["hits"]
+        stats["near_hits"] = self.near_hits
+        stats["disk_hits"] = self.disk_hits
+        stats["hits"] += self.near_hits + self.disk_hits
+        stats["misses"] = lookups - stats["hits"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class RoutingCache:
+    """
+    Cache of triage decisions: query fingerprint -> name of the handoff agent.
+
+    The fingerprint is the sorted set of content words of the query, so
+    rephrasings that only change word order, casing, punctuation or stop
+    words map to the same routing decision. Decisions are namespaced by the
+    triage agent and its list of handoffs. Routing decisions go stale far
+    more slowly than answers, so this cache has its own (longer) TTL and size
+    bound, independent of the response cache.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: Optional[float] = 24 * 3600.0):
+        self.decisions = LRUCache(max_entries=max_entries, ttl=ttl)
+
+    @staticmethod
+    def fingerprint(query: str) -> str:
+        words = sorted({w for w in TOKEN_RE.findall(query.lower()) if w not in STOP_WORDS})
+        return hashlib.sha1(" ".join(words).encode()).hexdigest()
+
+    @staticmethod
+    def namespace(agent) -> str:
+        return agent.name + ":" + ",".join(a.name for a in agent.handoffs)
+
+    def get(self, agent, query: str):
+        """Return the cached handoff agent for `query`, or None."""
+        agent_name = self.decisions.get((self.namespace(agent), self.fingerprint(query)))
+        if agent_name is None:
+            return None
+        for handoff_agent in agent.handoffs:
+            if handoff_agent.name == agent_name:
+                return handoff_agent
+        return None
+
+    def set(self, agent, query: str, handoff_agent):
+        self.decisions.set((self.namespace(agent), self.fingerprint(query)), handoff_agent.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.decisions.stats()
+
+
+def build_routing_cache() -> Optional[RoutingCache]:
+    """Build the routing cache from the environment, or None if ROUTING_CACHE=0."""
+    if os.environ.get("ROUTING_CACHE", "1") == "0":
+        return None
+    return RoutingCache(
+        max_entries=int(os.environ.get("ROUTING_CACHE_SIZE", "4096")),
+        ttl=float(os.environ.get("ROUTING_CACHE_TTL", str(24 * 3600))),
+    )
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache from the environment, or None if RESPONSE_CACHE=0."""
+    if os.environ.get("RESPONSE_CACHE", "1") == "0":
+        return None
+    ttl = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+    similarity = os.environ.get("RESPONSE_CACHE_SIMILARITY")
+    path = os.environ.get("RESPONSE_CACHE_PATH")
+    return ResponseCache(
+        max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "1024")),
+        ttl=ttl,
+        similarity_threshold=float(similarity) if similarity else None,
+        backend=SQLiteCacheBackend(path, ttl=ttl) if path else None,
+    )
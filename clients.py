@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+class ClientPool:
+    """
+    Registry of long-lived AsyncOpenAI clients keyed by API key.
+
+    Each client owns a keep-alive httpx connection pool, so consecutive calls
+    (e.g. triage followed by the specialist) reuse the same TLS connection
+    instead of opening a new one per request. Clients that have not been used
+    for `idle_timeout` seconds are closed and evicted.
+
+    httpx connection pools are bound to the event loop that created them, so
+    clients are also keyed by the running loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        idle_timeout: float = 600.0,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.idle_timeout = idle_timeout
+        self._clients: Dict[Tuple[str, int], "AsyncOpenAI"] = {}
+        self._last_used: Dict[Tuple[str, int], float] = {}
+
+    def get(self, api_key: Optional[str] = None) -> "AsyncOpenAI":
+        """Return the pooled client for `api_key`, creating it on first use."""
+        api_key = api_key or os.environ.get("OPENAI_API_KEY") or ""
+        key = (api_key, id(asyncio.get_running_loop()))
+        now = time.monotonic()
+
+        self._evict_idle(now)
+
+        client = self._clients.get(key)
+        if client is None:
+            # openai and httpx take a while to import, so only processes that call the API load them
+            import httpx
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+            )
+            # Retries are handled by resilience.complete, which also fails over to other models
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+            self._clients[key] = client
+        self._last_used[key] = now
+        return client
+
+    def _evict_idle(self, now: float):
+        for key, last_used in list(self._last_used.items()):
+            if now - last_used > self.idle_timeout:
+                client = self._clients.pop(key)
+                del self._last_used[key]
+                self._schedule_close(client)
+
+    @staticmethod
+    def _schedule_close(client: "AsyncOpenAI"):
+        # Closing is async; let it finish in the background of the current loop
+        try:
+            asyncio.get_running_loop().create_task(client.close())
+        except RuntimeError:
+            pass
+
+    async def aclose(self):
+        """Close every client created on the current event loop."""
+        loop_id = id(asyncio.get_running_loop())
+        for key in [k for k in self._clients if k[1] == loop_id]:
+            client = self._clients.pop(key)
+            self._last_used.pop(key, None)
+            await client.close()
+
+    def __len__(self):
+        return len(self._clients)
+
+
+# Shared pool used by Runner; sizes can be tuned through the environment
+client_pool = ClientPool(
+    max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    idle_timeout=float(os.environ.get("OPENAI_CLIENT_IDLE_TIMEOUT", "600")),
+)
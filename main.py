@@ -1,12 +1,83 @@
-from agents import (
-    Agent, InputGuardrail, GuardrailFunctionOutput, Runner,
-    triage_agent, WebdevOutput, guardrail_agent, webdev_guardrail,
-    frontend_architect_agent, backend_architect_agent, database_architect_agent,
-    api_architect_agent, security_architect_agent, devops_architect_agent,
-    scalability_architect_agent, performance_architect_agent, cloud_architect_agent,
-    mobile_architect_agent, llm_application_architect_agent, llm_tooling_architect_agent,
-    mcp_server_architect_agent, prompt_engineering_architect_agent,
-    llm_data_architect_agent, llm_fine_tuning_architect_agent
-)
+import argparse
 import asyncio
+import json
 
+from dotenv import load_dotenv
+
+from agents import Runner, response_cache, triage_agent
+from batch import BatchReport
+from clients import client_pool
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+
+def load_inputs(path):
+    """Read queries from a text file (one per line) or a JSONL file with a "query" field.
+
+    JSONL records may also carry the expected "agent", which is copied to the results.
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                records.append((record["query"], record.get("agent")))
+            else:
+                records.append((line, None))
+    return records
+
+
+async def run_batch(args):
+    agents_by_name = {agent.name: agent for agent in [triage_agent] + triage_agent.handoffs}
+    if args.agent not in agents_by_name:
+        raise SystemExit(f"Unknown agent {args.agent!r}. Available: {', '.join(agents_by_name)}")
+
+    records = load_inputs(args.input)
+    report = BatchReport()
+    routed_correctly = 0
+    labeled = sum(expected is not None for _, expected in records)
+
+    # Results are written as soon as each request completes
+    with open(args.output, "w") as out:
+        async for item in Runner.run_batch(
+            agents_by_name[args.agent],
+            [query for query, _ in records],
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+        ):
+            report.add(item)
+            record = item.to_dict()
+            expected = records[item.index][1]
+            if expected is not None:
+                record["expected_agent"] = expected
+                routed_correctly += item.result.agent_used == expected
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    print(report.format())
+    if labeled:
+        print(f"Routing accuracy: {routed_correctly / labeled:.1%} ({routed_correctly}/{labeled})")
+    await client_pool.aclose()
+    if response_cache is not None:
+        # Commit the cached answers still queued for disk before the process exits
+        response_cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WebDev Chat command line tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subcommands.add_parser("batch", help="Run many queries through an agent")
+    batch_parser.add_argument("input", help="Text file with one query per line, or JSONL with a \"query\" field")
+    batch_parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file for the results")
+    batch_parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum requests in flight")
+    batch_parser.add_argument("--max-retries", type=int, default=5, help="Retries per query after a rate limit")
+    batch_parser.add_argument("--agent", default=triage_agent.name, help="Name of the agent to run (default: triage)")
+
+    args = parser.parse_args()
+    if args.command == "batch":
+        asyncio.run(run_batch(args))
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# The tokenizer is loaded on the first count (loading its vocabulary is slow); False means unavailable
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of `text` (exact with tiktoken installed, ~4 characters per token otherwise)."""
+    _encoding = _get_encoding()
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+# Summarizer signature: (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Tuple[str, str]]], Awaitable[str]]
+
+
+class ConversationMemory:
+    """
+    Token-budgeted history of one chat session.
+
+    Recent turns are kept verbatim; once they exceed `token_budget` (or
+    `max_turns`), the oldest half of them is folded into a running summary.
+    Compacting in batches rather than sliding the window by one turn keeps
+    the prompt prefix (system message, summary, older turns) unchanged
+    between compactions, so the provider's prompt caching keeps hitting,
+    and the prompt size stays bounded however long the conversation gets.
+    """
+
+    def __init__(self, token_budget: int = 2000, max_turns: int = 10, summary_budget: int = 400):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_budget = summary_budget
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        # Name of the agent that gave the last answer, so follow-ups can stay with it
+        self.last_agent: Optional[str] = None
+        self._compaction: Optional[asyncio.Task] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+    def turn_tokens(self) -> int:
+        return sum(estimate_tokens(user) + estimate_tokens(assistant) for user, assistant in self.turns)
+
+    def needs_compaction(self) -> bool:
+        return len(self.turns) > self.max_turns or self.turn_tokens() > self.token_budget
+
+    def messages(self) -> List[Dict[str, str]]:
+        """History messages to place between the system message and the new user message."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        for user, assistant in self.turns:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        return messages
+
+    def add_turn(self, user: str, assistant: str, agent: Optional[str] = None):
+        self.turns.append((user, assistant))
+        self.last_agent = agent
+
+    def last_exchange(self, max_chars: int = 500) -> str:
+        """The summary and the last turn (answer shortened) as text, to route a follow-up in context."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary: {self.summary}")
+        if self.turns:
+            user, assistant = self.turns[-1]
+            parts.append(f"User: {user}\nAssistant: {assistant[:max_chars]}")
+        return "\n\n".join(parts)
+
+    async def compact(self, summarize: Summarizer):
+        """Fold the oldest half of the turns into the summary while over budget."""
+        while self.needs_compaction() and len(self.turns) > 1:
+            evicted = self.turns[: len(self.turns) // 2]
+            try:
+                self.summary = await summarize(self.summary, evicted)
+            except Exception as e:
+                # Without a summary the oldest turns are simply dropped
+                print(f"Error summarizing conversation: {e}")
+            self.turns = self.turns[len(evicted):]
+
+    def schedule_compaction(self, summarize: Summarizer):
+        """Compact in the background so summarization stays off the request's critical path."""
+        if self.needs_compaction() and (self._compaction is None or self._compaction.done()):
+            self._compaction = asyncio.create_task(self.compact(summarize))
+
+    async def wait_for_compaction(self):
+        """Let a background compaction finish before the history is used again."""
+        if self._compaction is not None and not self._compaction.done():
+            await self._compaction
+
+    def clear(self):
+        if self._compaction is not None:
+            self._compaction.cancel()
+        self.summary = ""
+        self.turns = []
+        self.last_agent = None
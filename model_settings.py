@@ -0,0 +1,140 @@
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Optional
+
+# Model for the answers, and the small fast model for short decisions (triage, guardrail, summaries)
+DEFAULT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4-turbo")
+FAST_MODEL = os.environ.get("OPENAI_FAST_MODEL", "gpt-4o-mini")
+
+
+class ModelSettings:
+    """Model and generation parameters for an agent; fields left as None fall back to the defaults."""
+
+    FIELDS = ("model", "max_tokens", "temperature", "response_format")
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.response_format = response_format
+
+    def resolve(self, override: Optional["ModelSettings"]) -> "ModelSettings":
+        """A copy of these settings with every field that `override` sets replaced."""
+        if override is None:
+            return ModelSettings(**self.to_dict())
+        return ModelSettings(**{
+            field: getattr(override, field) if getattr(override, field) is not None else getattr(self, field)
+            for field in self.FIELDS
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def to_kwargs(self) -> Dict[str, Any]:
+        """Generation parameters for chat.completions.create (the model is passed separately)."""
+        return {field: value for field, value in self.to_dict().items() if field != "model" and value is not None}
+
+    def __repr__(self):
+        return f"ModelSettings({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items() if v is not None)})"
+
+
+# Used for every field an agent does not set itself
+default_model_settings = ModelSettings(model=DEFAULT_MODEL, max_tokens=1000, temperature=0.7)
+
+
+def env_prefix(agent_name: str) -> str:
+    """Environment variable prefix for an agent, e.g. "Triage Agent" -> "TRIAGE_AGENT"."""
+    return re.sub(r"[^A-Z0-9]+", "_", agent_name.upper()).strip("_")
+
+
+def _from_env(prefix: str) -> ModelSettings:
+    max_tokens = os.environ.get(f"{prefix}_MAX_TOKENS")
+    temperature = os.environ.get(f"{prefix}_TEMPERATURE")
+    return ModelSettings(
+        model=os.environ.get(f"{prefix}_MODEL") or None,
+        max_tokens=int(max_tokens) if max_tokens else None,
+        temperature=float(temperature) if temperature else None,
+    )
+
+
+def load_model_config(path: str) -> Dict[str, Any]:
+    """Read a JSON (or, with PyYAML installed, YAML) model config file."""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            # Only imported for YAML configs, to keep startup fast
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML model configs")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+# Loaded on first use by model_config()
+_model_config: Optional[Dict[str, Any]] = None
+
+
+def model_config() -> Dict[str, Any]:
+    """
+    The model config file (MODEL_CONFIG, default model_config.json next to this module if it exists), loaded once.
+
+    Config file layout:
+        {
+            "default": {"model": "gpt-4-turbo", "max_tokens": 1000, "temperature": 0.7},
+            "agents": {"Database Architect": {"max_tokens": 1500, "fallback_models": ["gpt-4o"]}}
+        }
+
+    The "default" section replaces the defaults when the file is first loaded.
+    """
+    global _model_config, default_model_settings
+
+    if _model_config is None:
+        # Like agents.json, the default file lives next to the code, whatever the working directory
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_config.json")
+        path = os.environ.get("MODEL_CONFIG") or (default_path if os.path.exists(default_path) else None)
+        config = {}
+        if path:
+            try:
+                config = load_model_config(path)
+            except Exception as e:
+                print(f"Error loading model config {path}: {e}")
+
+        if config.get("default"):
+            default_model_settings = default_model_settings.resolve(
+                ModelSettings(**{k: v for k, v in config["default"].items() if k in ModelSettings.FIELDS})
+            )
+        _model_config = config
+    return _model_config
+
+
+def apply_model_config(agents: Iterable):
+    """
+    Apply the model config file and environment overrides to the agents.
+
+    Precedence, lowest first: the agent's own settings, the config file, then
+    per-agent environment variables such as TRIAGE_AGENT_MODEL or
+    DATABASE_ARCHITECT_MAX_TOKENS.
+    """
+    overrides = model_config().get("agents") or {}
+    for agent in agents:
+        override = overrides.get(agent.name) or {}
+        settings = (agent.model_settings or ModelSettings()).resolve(
+            ModelSettings(**{k: v for k, v in override.items() if k in ModelSettings.FIELDS})
+        )
+        agent.model_settings = settings.resolve(_from_env(env_prefix(agent.name)))
+        if "fallback_models" in override:
+            agent.fallback_models = override["fallback_models"]
+
+
+def effective_settings(agent) -> ModelSettings:
+    """The agent's settings with the defaults filled in."""
+    # Loading the config may replace the defaults
+    model_config()
+    return default_model_settings.resolve(agent.model_settings)
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+
+class WebdevOutput(BaseModel):
+    """The guardrail agent's verdict on whether a question is about web development."""
+
+    is_webdev: bool
+    # The guardrail stops reading at is_webdev, so the reasoning may not arrive
+    reasoning: str = ""
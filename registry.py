@@ -0,0 +1,116 @@
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from model_settings import DEFAULT_MODEL, FAST_MODEL, ModelSettings, apply_model_config, model_config
+
+# Model aliases usable in the spec, so it does not hardcode model names
+MODEL_ALIASES = {"default": DEFAULT_MODEL, "fast": FAST_MODEL}
+
+
+class LazyRouter:
+    """
+    Local router that is only built the first time a query is routed.
+
+    Building it imports numpy and vectorizes every agent's instructions, which
+    processes that never route (CLI tools, tests, idle workers) should not pay for.
+    """
+
+    def __init__(self, agents: List):
+        self.agents = agents
+        self._router = None
+        self._built = False
+
+    def get(self):
+        if not self._built:
+            from router import build_router
+            self._router = build_router(self.agents)
+            self._built = True
+        return self._router
+
+    def route(self, query: str):
+        router = self.get()
+        return router.route(query) if router is not None else None
+
+    def rank(self, query: str):
+        return self.get().rank(query)
+
+
+class AgentRegistry:
+    """
+    Agents declared in a JSON spec, each built the first time it is requested.
+
+    Each entry is keyed by the agent's variable name (e.g. "triage_agent").
+    Code objects the spec refers to (output types, guardrail functions) are
+    looked up by name in `namespace`, falling back to the namespace's module
+    `__getattr__` for names it loads lazily; handoffs refer to other entries
+    and are built along with the agent that uses them.
+    """
+
+    def __init__(self, path: str, factory: Callable, namespace: Dict[str, Any]):
+        self.path = path
+        self.factory = factory
+        self.namespace = namespace
+        self._spec: Optional[Dict[str, Dict]] = None
+        self._agents: Dict[str, Any] = {}
+
+    @property
+    def spec(self) -> Dict[str, Dict]:
+        if self._spec is None:
+            with open(self.path) as f:
+                self._spec = json.load(f)["agents"]
+            names = {entry["name"] for entry in self._spec.values()}
+            for name in set(model_config().get("agents") or {}) - names:
+                print(f"Model config for unknown agent {name!r} ignored")
+        return self._spec
+
+    def keys(self) -> List[str]:
+        return list(self.spec)
+
+    def has(self, key: str) -> bool:
+        return key in self.spec
+
+    def get(self, key: str):
+        """Return the agent with this variable name (or display name), building it on first use."""
+        if key not in self.spec:
+            key = next((k for k, entry in self.spec.items() if entry["name"] == key), key)
+        agent = self._agents.get(key)
+        if agent is None:
+            if key not in self.spec:
+                raise KeyError(f"Unknown agent {key!r}")
+            agent = self._build(self.spec[key])
+            self._agents[key] = agent
+        return agent
+
+    def _lookup(self, name: str):
+        if name in self.namespace:
+            return self.namespace[name]
+        if "__getattr__" in self.namespace:
+            return self.namespace["__getattr__"](name)
+        raise KeyError(name)
+
+    def _build(self, entry: Dict):
+        settings = entry.get("model_settings")
+        if settings is not None:
+            settings = dict(settings)
+            settings["model"] = MODEL_ALIASES.get(settings.get("model"), settings.get("model"))
+            settings = ModelSettings(**settings)
+
+        handoffs = [self.get(key) for key in entry.get("handoffs", [])]
+        agent = self.factory(
+            name=entry["name"],
+            instructions=entry["instructions"],
+            handoffs=handoffs,
+            input_guardrails=[
+                self._lookup("InputGuardrail")(guardrail_function=self._lookup(name))
+                for name in entry.get("input_guardrails", [])
+            ],
+            output_type=self._lookup(entry["output_type"]) if entry.get("output_type") else None,
+            handoff_description=entry.get("handoff_description", ""),
+            router=LazyRouter(handoffs) if entry.get("router") else None,
+            fallback_models=entry.get("fallback_models"),
+            model_settings=settings,
+            early_exit_fields=entry.get("early_exit_fields"),
+        )
+        # The config file and environment overrides apply on top of the spec
+        apply_model_config([agent])
+        return agent
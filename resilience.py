@@ -0,0 +1,275 @@
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from batch import percentile, retry_after_seconds
+from tracing import current_span
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx responses are worth another attempt."""
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(error, (TimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+class LatencyTracker:
+    """Latencies of recent successful calls, per call site and model, used to time hedged requests."""
+
+    def __init__(self, window: int = 200):
+        self.samples: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, key: str, model: str, seconds: float):
+        self.samples[(key, model)].append(seconds)
+
+    def p95(self, key: str, model: str, min_samples: int = 20) -> Optional[float]:
+        """p95 latency, or None until there are enough samples for it to mean anything."""
+        samples = self.samples.get((key, model))
+        if not samples or len(samples) < min_samples:
+            return None
+        return percentile(samples, 95)
+
+
+class HedgeBudget:
+    """
+    Caps hedged attempts at a fraction of the attempts that could be hedged.
+
+    When the backend is saturated every call is slower than the p95, and
+    unbounded hedging would then double the load exactly when there is no
+    capacity left for it. A token bucket: each hedge-eligible attempt adds
+    `ratio` of a hedge, up to `burst` hedges, so a long healthy period cannot
+    save up a flood of hedges for the next slowdown.
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.hedges = 0
+
+    def record_call(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.hedges += 1
+        return True
+
+
+class CallPolicy:
+    """
+    Deadline, retry and hedging settings for one hop (e.g. triage or the specialist call).
+
+    Args:
+        name: Hop name, also the default key for latency tracking
+        timeout: Seconds allowed for a single attempt
+        deadline: Seconds allowed for the whole hop, across retries and fallback models
+        max_retries: Retries per model after a retryable error
+        base_delay / max_delay: Bounds of the exponential backoff between retries
+        hedge: Start a second attempt when the first is slower than the p95 latency
+        min_hedge_delay: Never hedge earlier than this many seconds
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 30.0,
+        deadline: float = 60.0,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge: bool = True,
+        min_hedge_delay: float = 0.5,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+
+
+def build_policy(name: str, timeout: float, deadline: float) -> CallPolicy:
+    """Policy for the `name` hop, overridable with <NAME>_TIMEOUT / <NAME>_DEADLINE and the shared OPENAI_* settings."""
+    prefix = name.upper()
+    return CallPolicy(
+        name,
+        timeout=float(os.environ.get(f"{prefix}_TIMEOUT", timeout)),
+        deadline=float(os.environ.get(f"{prefix}_DEADLINE", deadline)),
+        max_retries=int(os.environ.get("OPENAI_MAX_RETRIES", "2")),
+        hedge=os.environ.get("OPENAI_HEDGE", "1") != "0",
+        min_hedge_delay=float(os.environ.get("OPENAI_HEDGE_MIN_DELAY", "0.5")),
+    )
+
+
+# False while the caller handles rate limits itself (see rate_limit_retries)
+_retry_rate_limits: ContextVar[bool] = ContextVar("retry_rate_limits", default=True)
+
+
+@contextmanager
+def rate_limit_retries(enabled: bool) -> Iterator[None]:
+    """
+    Whether calls made inside the block retry rate limits and fail over on them.
+
+    Disable it when the caller has its own rate-limit handling, such as the
+    batch runner's shared backoff: the rate limit error is then raised on the
+    first 429, and answers never silently come from a fallback model because
+    the primary one was rate limited.
+    """
+    token = _retry_rate_limits.set(enabled)
+    try:
+        yield
+    finally:
+        try:
+            _retry_rate_limits.reset(token)
+        except ValueError:
+            # Exited from a different context (e.g. an async generator resumed by another task)
+            pass
+
+
+async def _hedged(call: Callable[[], Awaitable[Any]], delay: float):
+    """
+    Run `call`, starting a second copy if the first has not finished after `delay`.
+
+    Returns the first successful result and cancels the other attempt; raises
+    only if both fail. No second copy is started once the hedge budget is spent.
+    """
+    tasks = [asyncio.create_task(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and hedge_budget.try_spend():
+            tasks.append(asyncio.create_task(call()))
+            span = current_span()
+            if span is not None:
+                span.set_attribute("hedged", True)
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _attempt(create, model: str, kwargs: Dict, policy: CallPolicy, timeout: float, hedge: bool, key: str):
+    # A stream "responds" once its headers arrive, a normal call once the whole completion
+    # is generated; mixing the two would make normal calls look slow and hedge nearly always
+    if kwargs.get("stream"):
+        key = f"{key}:stream"
+    start = time.perf_counter()
+    hedge_delay = latency_tracker.p95(key, model) if hedge else None
+    if hedge_delay is not None:
+        hedge_delay = max(hedge_delay, policy.min_hedge_delay)
+        # Only attempts that could be hedged earn hedge budget
+        if hedge_delay < timeout:
+            hedge_budget.record_call()
+    try:
+        if hedge_delay is None or hedge_delay >= timeout:
+            response = await asyncio.wait_for(create(model=model, **kwargs), timeout)
+        else:
+            response = await asyncio.wait_for(_hedged(lambda: create(model=model, **kwargs), hedge_delay), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"{model} did not respond within {timeout:g} seconds") from None
+    latency_tracker.record(key, model, time.perf_counter() - start)
+    return response
+
+
+async def complete(
+    create: Callable[..., Awaitable[Any]],
+    models: List[str],
+    policy: CallPolicy,
+    hedge: Optional[bool] = None,
+    key: Optional[str] = None,
+    retry_rate_limits: Optional[bool] = None,
+    **kwargs
+):
+    """
+    Call `create(model=..., **kwargs)` with a deadline, retries, hedging and model failover.
+
+    Args:
+        create: The API method, e.g. client.chat.completions.create
+        models: The model to use followed by its fallbacks, tried in order
+        policy: Timeouts, retries and hedging for this hop
+        hedge: Override policy.hedge (streams are not hedged)
+        key: Latency tracking key, for hops whose latency differs per agent
+        retry_rate_limits: Retry rate limits and fail over on them (default: see rate_limit_retries)
+
+    Returns:
+        The first successful response. Once every model has failed, or the hop
+        deadline has passed, the last error is raised.
+    """
+    from openai import AuthenticationError, RateLimitError
+
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + policy.deadline
+    hedge = policy.hedge if hedge is None else hedge
+    retry_rate_limits = _retry_rate_limits.get() if retry_rate_limits is None else retry_rate_limits
+    key = key or policy.name
+    last_error: Optional[Exception] = None
+    attempts = 0
+
+    for model in models:
+        delay = policy.base_delay
+        for retry in range(policy.max_retries + 1):
+            remaining = expires_at - loop.time()
+            if remaining <= 0:
+                raise last_error or TimeoutError(f"{policy.name} did not finish within {policy.deadline:g} seconds")
+            attempts += 1
+            try:
+                response = await _attempt(create, model, kwargs, policy, min(policy.timeout, remaining), hedge, key)
+                span = current_span()
+                if span is not None and attempts > 1:
+                    span.set_attribute("attempts", attempts)
+                if span is not None and model != models[0]:
+                    span.set_attribute("fallback_model", model)
+                return response
+            except Exception as e:
+                last_error = e
+                print(f"Error calling {model} ({policy.name}, attempt {attempts}): {e}")
+                if isinstance(e, RateLimitError) and not retry_rate_limits:
+                    raise
+                if not is_retryable(e):
+                    break
+                if retry < policy.max_retries:
+                    # Exponential backoff with jitter, or the server's Retry-After on rate limits
+                    wait = retry_after_seconds(e) if isinstance(e, RateLimitError) else None
+                    wait = min(wait or delay * random.uniform(0.5, 1.5), policy.max_delay)
+                    await asyncio.sleep(min(wait, max(0.0, expires_at - loop.time())))
+                    delay *= 2
+        # A rejected API key is rejected by every model
+        if isinstance(last_error, AuthenticationError):
+            break
+
+    raise last_error
+
+
+# Shared by every hop; keys separate call sites whose latencies differ
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget(
+    float(os.environ.get("OPENAI_HEDGE_BUDGET", "0.05")),
+    burst=float(os.environ.get("OPENAI_HEDGE_BURST", "10")),
+)
+
+# Default fallback chain for agents that do not set their own (comma-separated, empty to disable)
+default_fallback_models = [m.strip() for m in os.environ.get("OPENAI_FALLBACK_MODELS", "gpt-4o").split(",") if m.strip()]
+
+# Triage decisions are short, so they get a much tighter deadline than answers
+triage_policy = build_policy("triage", timeout=10.0, deadline=30.0)
+specialist_policy = build_policy("specialist", timeout=60.0, deadline=120.0)
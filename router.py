@@ -0,0 +1,105 @@
+import os
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from text import STOP_WORDS, TOKEN_RE
+
+
+class HashingVectorizer:
+    """
+    Stateless text vectorizer using the hashing trick.
+
+    Word unigrams/bigrams and character trigrams are hashed (with a stable
+    CRC32, not Python's salted `hash`) into a fixed number of buckets, so no
+    vocabulary has to be fitted or stored.
+    """
+
+    def __init__(self, n_features: int = 2 ** 14, char_ngram: int = 3):
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+
+    def features(self, text: str) -> List[str]:
+        words = [w for w in TOKEN_RE.findall(text.lower()) if w not in STOP_WORDS]
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        n = self.char_ngram
+        for word in words:
+            padded = f"<{word}>"
+            features += ["#" + padded[i:i + n] for i in range(len(padded) - n + 1)]
+        return features
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an (n_texts, n_features) matrix of sublinear term frequencies."""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self.features(text):
+                matrix[row, zlib.crc32(feature.encode()) % self.n_features] += 1.0
+        np.log1p(matrix, out=matrix)
+        return matrix
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalRouter:
+    """
+    Route a query to one of the handoff agents without calling the LLM.
+
+    Each agent is represented by a TF-IDF vector over its name,
+    `handoff_description` and `instructions`, computed once at construction.
+    A query is scored against all agents with a single matrix-vector product;
+    `route` only commits to the best agent when it beats the runner-up by at
+    least `threshold` (cosine similarity), otherwise it returns None so the
+    caller can fall back to LLM triage.
+    """
+
+    def __init__(
+        self,
+        agents: Sequence,
+        threshold: float = 0.05,
+        vectorizer: Optional[HashingVectorizer] = None,
+    ):
+        self.agents = list(agents)
+        self.threshold = threshold
+        self.vectorizer = vectorizer or HashingVectorizer()
+
+        documents = [
+            f"{a.name} {a.name} {a.handoff_description} {a.instructions}" for a in self.agents
+        ]
+        counts = self.vectorizer.transform(documents)
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = _normalize(counts * self.idf)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Cosine similarity between the query and every agent."""
+        vector = _normalize(self.vectorizer.transform([query])[0] * self.idf)
+        return self.matrix @ vector
+
+    def rank(self, query: str) -> List[Tuple[object, float]]:
+        """All agents with their scores, best first."""
+        scores = self.scores(query)
+        order = np.argsort(-scores)
+        return [(self.agents[i], float(scores[i])) for i in order]
+
+    def route(self, query: str):
+        """Return the best agent if the top-2 margin clears the threshold, else None."""
+        scores = self.scores(query)
+        if len(scores) == 1:
+            return self.agents[0]
+        second, first = np.argpartition(scores, -2)[-2:]
+        if scores[first] - scores[second] < self.threshold:
+            return None
+        return self.agents[first]
+
+
+def build_router(agents: Sequence) -> Optional[LocalRouter]:
+    """Build the router for `agents`, unless disabled with LOCAL_ROUTER=0."""
+    if os.environ.get("LOCAL_ROUTER", "1") == "0":
+        return None
+    return LocalRouter(agents, threshold=float(os.environ.get("LOCAL_ROUTER_THRESHOLD", "0.05")))
@@ -0,0 +1,307 @@
+"""
+Headless HTTP API for the triage -> specialist pipeline.
+
+Routes:
+    POST /v1/ask          {"message": ..., "session_id": ..., "fanout": false} -> the complete answer
+    POST /v1/ask/stream   Same request; the answer is streamed as server-sent events
+    GET  /v1/agents       The available agents and their model settings
+    GET  /v1/usage        Tokens and estimated cost so far, of one session (?session_id=) or the worker
+    GET  /metrics         Request, token and cost metrics in the Prometheus text format
+    GET  /healthz         Liveness check
+
+Run with several worker processes:
+    python server.py --workers 4 --port 8000
+
+Each worker has its own OpenAI client pool, caches, conversation sessions
+and metrics. Sessions are therefore only kept across requests that reach the
+same worker (use sticky routing, or a single worker, if that matters).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from agents import Runner, response_cache, triage_agent
+from batch import percentile
+from cache import LRUCache
+from clients import client_pool
+from memory import ConversationMemory
+from model_settings import effective_settings
+from tracing import current_span, trace
+from usage import UsageLedger, completion_budget, prometheus_lines, usage_ledger
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+# Requests handled at once per worker; beyond that the server answers 503 instead of queueing
+MAX_IN_FLIGHT = int(os.environ.get("SERVER_MAX_IN_FLIGHT", "256"))
+# Conversation memories and usage ledgers of recent sessions, evicted after SERVER_SESSION_TTL seconds without use
+SESSION_LIMIT = int(os.environ.get("SERVER_SESSIONS", "10000"))
+SESSION_TTL = float(os.environ.get("SERVER_SESSION_TTL", "3600"))
+
+
+class AskRequest(BaseModel):
+    message: str
+    # Requests with the same session_id share a conversation history
+    session_id: Optional[str] = None
+    # Ask several specialists and merge their answers (not available for streaming)
+    fanout: bool = False
+
+
+class Metrics:
+    """Request counts and latencies per route, and answers per agent, for /metrics."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = defaultdict(int)
+        self.agents = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.latency_sums = defaultdict(float)
+        self.in_flight = 0
+        self.rejected = 0
+
+    def observe(self, route: str, status: int, seconds: float):
+        self.requests[(route, status)] += 1
+        self.latencies[route].append(seconds)
+        self.latency_sums[route] += seconds
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE webdev_requests_total counter",
+            *(f'webdev_requests_total{{route="{route}",status="{status}"}} {count}'
+              for (route, status), count in sorted(self.requests.items())),
+            "# TYPE webdev_request_duration_seconds summary",
+        ]
+        for route, samples in sorted(self.latencies.items()):
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(f'webdev_request_duration_seconds{{route="{route}",quantile="{quantile}"}} '
+                             f"{percentile(samples, quantile * 100):.6f}")
+            count = sum(n for (r, _), n in self.requests.items() if r == route)
+            lines.append(f'webdev_request_duration_seconds_sum{{route="{route}"}} {self.latency_sums[route]:.6f}')
+            lines.append(f'webdev_request_duration_seconds_count{{route="{route}"}} {count}')
+        lines += [
+            "# TYPE webdev_answers_total counter",
+            *(f'webdev_answers_total{{agent="{agent}"}} {count}' for agent, count in sorted(self.agents.items())),
+            "# TYPE webdev_requests_in_flight gauge",
+            f"webdev_requests_in_flight {self.in_flight}",
+            "# TYPE webdev_requests_rejected_total counter",
+            f"webdev_requests_rejected_total {self.rejected}",
+            *prometheus_lines(),
+            "# TYPE webdev_max_tokens gauge",
+            *(f'webdev_max_tokens{{agent="{agent.name}"}} '
+              f"{completion_budget.max_tokens(agent.name, effective_settings(agent).max_tokens)}"
+              for agent in triage_agent.handoffs),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+sessions = LRUCache(SESSION_LIMIT, ttl=SESSION_TTL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Uvicorn has let in-flight requests finish by now; close the pooled connections
+    await client_pool.aclose()
+    if response_cache is not None:
+        # Commit the cached answers still queued for disk
+        await asyncio.to_thread(response_cache.close)
+
+
+app = FastAPI(title="WebDev Architect API", lifespan=lifespan)
+
+
+class MetricsMiddleware:
+    """
+    Counts and times /v1/ requests, and sheds load beyond MAX_IN_FLIGHT.
+
+    A plain ASGI middleware, so a request stays in flight until its last
+    (possibly streamed) byte is sent, and is released however it ends,
+    including when the client disconnects before the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = scope.get("path", "")
+        if scope["type"] != "http" or not route.startswith("/v1/"):
+            await self.app(scope, receive, send)
+            return
+
+        # Shed load instead of letting requests queue up behind a slow backend
+        if metrics.in_flight >= MAX_IN_FLIGHT:
+            metrics.rejected += 1
+            response = JSONResponse({"error": "Server busy, try again later"}, status_code=503, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            try:
+                await send(message)
+            except Exception:
+                # The client went away; recorded as nginx's "client closed request"
+                status = 499
+                raise
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe(route, status, time.perf_counter() - start)
+
+
+app.add_middleware(MetricsMiddleware)
+
+
+def get_context(session_id: Optional[str]) -> Optional[dict]:
+    """The session's run context: its conversation memory and usage ledger."""
+    if not session_id:
+        return None
+    context = sessions.get(session_id)
+    if context is None:
+        context = {"memory": ConversationMemory(), "usage": UsageLedger()}
+    # Setting it again restarts the session's time-to-live
+    sessions.set(session_id, context)
+    return context
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/v1/ask")
+async def ask(body: AskRequest, x_openai_api_key: Optional[str] = Header(default=None)):
+    """Answer a question with the triage agent (or several specialists with fanout)."""
+    context = get_context(body.session_id)
+    start = time.perf_counter()
+    with trace("HTTP ask"):
+        trace_id = current_span().trace_id
+        if body.fanout:
+            result = await Runner.run_fanout(triage_agent, body.message, context=context, api_key=x_openai_api_key)
+        else:
+            result = await Runner.run(triage_agent, body.message, context=context, api_key=x_openai_api_key)
+    metrics.agents[result.agent_used] += 1
+
+    payload = {
+        "output": result.final_output,
+        "agent_used": result.agent_used,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        "trace_id": trace_id,
+        "usage": result.usage.to_dict() if result.usage is not None else None,
+    }
+    # Runner reports failures as an "Error" result; surface them as a bad gateway
+    return JSONResponse(payload, status_code=502 if result.agent_used == "Error" else 200)
+
+
+@app.post("/v1/ask/stream")
+async def ask_stream(body: AskRequest, x_openai_api_key: Optional[str] = Header(default=None)):
+    """
+    Stream the answer as server-sent events: one `agent` event once the
+    specialist is chosen, `delta` events as text arrives, and a final `done`.
+    """
+    context = get_context(body.session_id)
+
+    async def events():
+        start = time.perf_counter()
+        first_token = None
+        agent_used = None
+        usage = None
+        with trace("HTTP ask stream"):
+            trace_id = current_span().trace_id
+            async for event in Runner.run_streamed(triage_agent, body.message, context=context, api_key=x_openai_api_key):
+                if event.agent_used != agent_used:
+                    agent_used = event.agent_used
+                    yield sse("agent", {"agent_used": agent_used})
+                if event.delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield sse("delta", {"delta": event.delta})
+                if event.usage is not None:
+                    usage = event.usage.to_dict()
+        metrics.agents[agent_used] += 1
+        yield sse("done", {
+            "agent_used": agent_used,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+            "time_to_first_token_ms": round(first_token * 1000, 3) if first_token is not None else None,
+            "trace_id": trace_id,
+            "usage": usage,
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/v1/agents")
+async def list_agents():
+    return {
+        "agents": [
+            {
+                "name": agent.name,
+                "description": agent.handoff_description or "Main triage agent",
+                "model_settings": effective_settings(agent).to_dict(),
+                # The max_tokens currently requested, sized from the agent's recent answers
+                "adaptive_max_tokens": completion_budget.max_tokens(agent.name, effective_settings(agent).max_tokens),
+            }
+            for agent in [triage_agent] + triage_agent.handoffs
+        ]
+    }
+
+
+@app.get("/v1/usage")
+async def get_usage(session_id: Optional[str] = None):
+    """Usage of a session (a query parameter, so session ids do not become metric labels), or of this worker."""
+    if session_id is None:
+        return usage_ledger.to_dict()
+    context = sessions.get(session_id)
+    if context is None:
+        return JSONResponse({"error": "Unknown session"}, status_code=404)
+    return context["usage"].to_dict()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVER_WORKERS", "1")))
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds in-flight requests get to finish on shutdown")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # Keep client connections open between requests
+        timeout_keep_alive=30,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level="warning",
+    )
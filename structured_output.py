@@ -0,0 +1,154 @@
+import copy
+import json
+import os
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from pydantic import TypeAdapter
+
+# Models that accept a strict "json_schema" response_format (prefixes; others get JSON mode)
+STRUCTURED_OUTPUT_MODELS = tuple(
+    os.environ.get("STRUCTURED_OUTPUT_MODELS", "gpt-4o,gpt-4.1,gpt-5,o1,o3,o4").split(",")
+)
+
+
+@lru_cache(maxsize=None)
+def type_adapter(output_type) -> "TypeAdapter":
+    """Validator for an output type, built once per type (building one compiles its schema)."""
+    # pydantic is imported by the first agent with an output type, not at startup
+    from pydantic import TypeAdapter
+
+    return TypeAdapter(output_type)
+
+
+def validate_output(output_type, value: Any) -> Any:
+    """Validate JSON text, parsed JSON or an existing instance as `output_type`."""
+    adapter = type_adapter(output_type)
+    if isinstance(value, (str, bytes)):
+        return adapter.validate_json(value)
+    return adapter.validate_python(value)
+
+
+def dump_output(output_type, value: Any) -> Any:
+    """A validated output as plain JSON-compatible data."""
+    return type_adapter(output_type).dump_python(value, mode="json")
+
+
+@lru_cache(maxsize=None)
+def json_schema(output_type) -> Dict[str, Any]:
+    return type_adapter(output_type).json_schema()
+
+
+def _strict(schema: Any) -> Any:
+    """Adapt a JSON schema to OpenAI's strict mode: closed objects, every property required, no defaults."""
+    if isinstance(schema, list):
+        return [_strict(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: _strict(value) for key, value in schema.items() if key not in ("default", "properties", "$defs")}
+    # The keys of these two are names, not keywords
+    for key in ("properties", "$defs"):
+        if key in schema:
+            strict[key] = {name: _strict(value) for name, value in schema[key].items()}
+    if "properties" in strict:
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+
+@lru_cache(maxsize=None)
+def strict_json_schema(output_type) -> Optional[Dict[str, Any]]:
+    """The output type's schema in strict mode, or None if its root is not an object."""
+    schema = json_schema(output_type)
+    if schema.get("type") != "object":
+        return None
+    return _strict(copy.deepcopy(schema))
+
+
+def response_format_for(output_type, model: str) -> Dict[str, Any]:
+    """
+    The response_format that makes `model` answer with an `output_type`.
+
+    Models that support structured outputs get the type's strict JSON schema,
+    which the provider enforces while decoding. Older models get JSON mode,
+    with the schema in the prompt.
+    """
+    schema = strict_json_schema(output_type)
+    if schema is None or not model.startswith(STRUCTURED_OUTPUT_MODELS):
+        return {"type": "json_object"}
+    name = re.sub(r"[^a-zA-Z0-9_-]", "_", getattr(output_type, "__name__", "output"))[:64]
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+
+class IncrementalJSONObject:
+    """
+    Parses a JSON object as it streams in, exposing each top-level field as soon as its value is complete.
+
+    Text is scanned once, however many pieces it arrives in, so the fields can
+    be checked after every streamed token.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # Start of the top-level key or value being read, and the key whose value is being read
+        self._start: Optional[int] = None
+        self._key: Optional[str] = None
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        """Add the next piece of text and return the fields completed so far."""
+        self.buffer += text
+        buffer = self.buffer
+        for i in range(self._position, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    # A string value is complete at its closing quote
+                    if self._depth == 1 and self._key is not None:
+                        self._end_value(i + 1)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._start is None:
+                    self._start = i
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and self._start is None:
+                    self._start = i
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth <= 1:
+                    # Closing a nested value, or the object itself
+                    self._end_value(i + 1 if self._depth == 1 else i)
+            elif self._depth == 1:
+                if char == ":" and self._start is not None:
+                    self._key = json.loads(buffer[self._start:i])
+                    self._start = None
+                elif char == ",":
+                    self._end_value(i)
+                elif not char.isspace() and self._start is None:
+                    # Start of a number, true, false or null
+                    self._start = i
+        self._position = len(buffer)
+        return self.fields
+
+    def _end_value(self, end: int):
+        if self._key is not None and self._start is not None:
+            try:
+                self.fields[self._key] = json.loads(self.buffer[self._start:end])
+            except ValueError:
+                pass
+            self._key = None
+            self._start = None
@@ -0,0 +1,10 @@
+"""Tokenization shared by the local router and the caches (kept free of heavy imports)."""
+import re
+
+# Words that carry no routing signal (most of them appear in every agent's instructions)
+STOP_WORDS = frozenset("""
+a an and are as at be by can do does for from how i in into is it its me my of on or our
+should that the their this to use using we what when which why will with you your
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[+#.][a-z0-9]+)*")
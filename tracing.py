@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+# The innermost open span; asyncio tasks inherit it when they are created
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def record_usage(self, response):
+        """Capture the model name and token usage of an OpenAI response (or final stream chunk)."""
+        if getattr(response, "model", None):
+            self.attributes["model"] = response.model
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.attributes["usage.prompt_tokens"] = usage.prompt_tokens
+            self.attributes["usage.completion_tokens"] = usage.completion_tokens
+            self.attributes["usage.total_tokens"] = usage.total_tokens
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.perf_counter_ns()
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.perf_counter_ns()) - self.start_ns
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_unix_ns": self.start_unix_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def to_otel(span: Span) -> Dict[str, Any]:
+    """Convert a span to the OTLP/JSON span representation used by OpenTelemetry collectors."""
+
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id or "",
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_unix_ns),
+        "endTimeUnixNano": str(span.start_unix_ns + span.duration_ns),
+        "attributes": [{"key": k, "value": value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1},
+    }
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans in a ring buffer."""
+
+    def __init__(self, max_spans: int = 1000):
+        self.buffer = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self.buffer.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        return [s for s in self.buffer if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self):
+        self.buffer.clear()
+
+
+class JSONLExporter:
+    """Appends every finished span as one JSON line to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class OTelDictExporter:
+    """Hands every finished span to `sink` as an OpenTelemetry-compatible (OTLP/JSON) dict."""
+
+    def __init__(self, sink: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.exported: List[Dict[str, Any]] = []
+        self.sink = sink or self.exported.append
+
+    def export(self, span: Span):
+        self.sink(to_otel(span))
+
+
+class ConsoleExporter:
+    """Prints the total duration of each root span (a whole trace)."""
+
+    def export(self, span: Span):
+        if span.parent_id is None:
+            print(f"Trace '{span.name}' finished in {span.duration_ms / 1000:.4f} seconds")
+
+
+exporters: List[Any] = []
+
+
+def add_exporter(exporter):
+    exporters.append(exporter)
+
+
+def remove_exporter(exporter):
+    exporters.remove(exporter)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class span:
+    """
+    Context manager that records a span nested under the current one.
+
+    Works across `await`s: tasks created inside the block inherit it as their
+    parent span through contextvars.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def _parent(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def __enter__(self) -> Span:
+        parent = self._parent()
+        self.span = Span(self.name, parent=parent, attributes=self.attributes)
+        self.parent = parent
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.span.end()
+        if isinstance(exc_val, asyncio.CancelledError):
+            self.span.status = "cancelled"
+        elif exc_val is not None and not isinstance(exc_val, GeneratorExit):
+            self.span.status = "error"
+            self.span.error = f"{exc_type.__name__}: {exc_val}"
+        try:
+            _current_span.reset(self.token)
+        except ValueError:
+            # Exited from a different context (e.g. an async generator resumed by another task)
+            _current_span.set(self.parent)
+        for exporter in exporters:
+            try:
+                exporter.export(self.span)
+            except Exception as e:
+                print(f"Error exporting span: {e}")
+
+
+class SpanSteps:
+    """
+    Keeps the spans of code that runs in steps, such as an async generator, out of its caller.
+
+    Run each step inside `with steps:`. The span that was current when the
+    previous step ended is made current again (the caller's own span for the
+    first step), and the caller's span is restored when the step ends, so a
+    span left open between steps never becomes the parent of the caller's spans.
+    """
+
+    def __init__(self):
+        self.span: Optional[Span] = None
+        self.started = False
+
+    def __enter__(self) -> "SpanSteps":
+        self.caller = _current_span.get()
+        self.token = _current_span.set(self.span if self.started else self.caller)
+        self.started = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.span = _current_span.get()
+        try:
+            _current_span.reset(self.token)
+        except ValueError:
+            _current_span.set(self.caller)
+
+
+class trace(span):
+    """A root span: always starts a new trace, even inside another one."""
+
+    def _parent(self) -> Optional[Span]:
+        return None
+
+
+# Recent spans are always kept in memory; console and JSONL output are configurable
+memory_exporter = InMemoryExporter(int(os.environ.get("TRACE_BUFFER_SIZE", "1000")))
+add_exporter(memory_exporter)
+if os.environ.get("TRACE_CONSOLE", "1") != "0":
+    add_exporter(ConsoleExporter())
+if os.environ.get("TRACE_JSONL_PATH"):
+    add_exporter(JSONLExporter(os.environ["TRACE_JSONL_PATH"]))
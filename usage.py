@@ -0,0 +1,237 @@
+import os
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from batch import percentile
+from memory import estimate_tokens
+from model_settings import model_config
+
+# Estimated prices in USD per million tokens; "cached_input" applies to prompt tokens served from
+# the provider's prompt cache. Override or extend them with a "prices" section in the model config.
+PRICES = {
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4-turbo": {"input": 10.00, "cached_input": 10.00, "output": 30.00},
+    "gpt-4": {"input": 30.00, "cached_input": 30.00, "output": 60.00},
+    "gpt-3.5-turbo": {"input": 0.50, "cached_input": 0.50, "output": 1.50},
+}
+
+
+def price(model: str) -> Optional[Dict[str, float]]:
+    """Prices for a model; dated snapshots such as gpt-4o-2024-08-06 use their base model's prices."""
+    prices = {**PRICES, **(model_config().get("prices") or {})}
+    # The longest matching prefix, so gpt-4o-mini is not priced as gpt-4o
+    matches = [name for name in prices if model == name or model.startswith(name + "-")]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimated cost of a call in USD (0 for models without a known price)."""
+    prices = price(model)
+    if prices is None:
+        return 0.0
+    cached_price = prices.get("cached_input", prices["input"])
+    return (
+        (prompt_tokens - cached_tokens) * prices["input"]
+        + cached_tokens * cached_price
+        + completion_tokens * prices["output"]
+    ) / 1e6
+
+
+class Usage:
+    """Token counts and estimated cost of one or more model calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int, cost: float):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+class UsageLedger:
+    """
+    Usage broken down by agent and model.
+
+    The same class accounts for a single request (RunResult.usage), a
+    conversation session (context["usage"]) and the whole process (usage_ledger).
+    """
+
+    def __init__(self):
+        self.total = Usage()
+        self.by_agent: Dict[str, Usage] = defaultdict(Usage)
+        self.by_agent_model: Dict[Tuple[str, str], Usage] = defaultdict(Usage)
+
+    def record(self, agent: str, model: str, prompt_tokens: int, completion_tokens: int,
+               cached_tokens: int = 0, cost: float = 0.0):
+        for usage in (self.total, self.by_agent[agent], self.by_agent_model[(agent, model)]):
+            usage.add(prompt_tokens, completion_tokens, cached_tokens, cost)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.total.to_dict(), "agents": {agent: usage.to_dict() for agent, usage in self.by_agent.items()}}
+
+    def summary(self) -> str:
+        """Human-readable totals with one line per agent."""
+        lines = [f"{self.total.total_tokens:,} tokens "
+                 f"({self.total.prompt_tokens:,} prompt, {self.total.completion_tokens:,} completion), "
+                 f"~${self.total.cost:.4f}"]
+        for agent, usage in sorted(self.by_agent.items(), key=lambda item: -item[1].cost):
+            lines.append(f"  {agent}: {usage.total_tokens:,} tokens in {usage.calls} calls, ~${usage.cost:.4f}")
+        return "\n".join(lines)
+
+
+# Usage of every call made by this process
+usage_ledger = UsageLedger()
+
+# Ledgers of the request being run (and its session), shared with the tasks it starts
+_active_ledgers: ContextVar[Tuple[UsageLedger, ...]] = ContextVar("active_usage_ledgers", default=())
+
+
+@contextmanager
+def track_usage(session: Optional[UsageLedger] = None, request: Optional[UsageLedger] = None) -> Iterator[UsageLedger]:
+    """
+    Collect the usage of every model call made inside the block into a request ledger.
+
+    The ledger is `request`, to resume a request across several blocks, or a
+    new one. Calls are also added to `session` when given. A nested run (e.g.
+    the guardrail's) is accounted to the request that started it. Background
+    tasks started inside the block, such as conversation summaries, keep
+    adding to the same ledgers after it ends.
+    """
+    active = _active_ledgers.get()
+    if active and request is None:
+        yield active[0]
+        return
+    request = request if request is not None else UsageLedger()
+    token = _active_ledgers.set((request,) + ((session,) if session is not None and session is not request else ()))
+    try:
+        yield request
+    finally:
+        try:
+            _active_ledgers.reset(token)
+        except ValueError:
+            # Exited from a different context (e.g. an abandoned generator finalized by the event loop)
+            _active_ledgers.set(active)
+
+
+def record_usage(agent: str, response):
+    """Account the token usage of an OpenAI response (or final stream chunk) to `agent`."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    model = getattr(response, "model", None) or "unknown"
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+    cost = estimate_cost(model, usage.prompt_tokens, usage.completion_tokens, cached_tokens)
+    for ledger in (usage_ledger,) + _active_ledgers.get():
+        ledger.record(agent, model, usage.prompt_tokens, usage.completion_tokens, cached_tokens, cost)
+
+
+def record_estimated_usage(agent: str, model: Optional[str], messages, completion: str):
+    """Account a call whose stream was closed before the provider reported its usage, estimating the tokens."""
+    prompt_tokens = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+    completion_tokens = estimate_tokens(completion)
+    model = model or "unknown"
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    for ledger in (usage_ledger,) + _active_ledgers.get():
+        ledger.record(agent, model, prompt_tokens, completion_tokens, 0, cost)
+
+
+class CompletionBudget:
+    """
+    Sizes each agent's max_tokens from the lengths of its recent complete answers.
+
+    A large max_tokens does not make answers longer, but it is what the
+    provider reserves against the rate limit, and it is how long a runaway
+    generation can go on. Once an agent has `min_samples` answers, its limit
+    becomes the `quantile` answer length times `headroom` (never above the
+    configured max_tokens). Answers cut off at the adaptive limit are counted
+    as truncations; the caller finishes them with the configured limit, and
+    their full length then raises the budget.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        quantile: float = 99,
+        headroom: float = 1.5,
+        min_samples: int = 20,
+        floor: int = 64,
+        window: int = 500,
+    ):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+        self.lengths: Dict[str, Deque[int]] = defaultdict(lambda: deque(maxlen=window))
+        self.truncations: Dict[str, int] = defaultdict(int)
+
+    def max_tokens(self, agent: str, configured: Optional[int]) -> Optional[int]:
+        """The limit to request for the agent's next answer."""
+        samples = self.lengths.get(agent)
+        if not self.enabled or configured is None or not samples or len(samples) < self.min_samples:
+            return configured
+        return min(configured, max(self.floor, int(percentile(samples, self.quantile) * self.headroom)))
+
+    def observe(self, agent: str, completion_tokens: int):
+        """Record the length of a complete answer."""
+        self.lengths[agent].append(completion_tokens)
+
+    def record_truncation(self, agent: str):
+        self.truncations[agent] += 1
+
+
+completion_budget = CompletionBudget(
+    enabled=os.environ.get("ADAPTIVE_MAX_TOKENS", "1") != "0",
+    headroom=float(os.environ.get("ADAPTIVE_MAX_TOKENS_HEADROOM", "1.5")),
+    min_samples=int(os.environ.get("ADAPTIVE_MAX_TOKENS_MIN_SAMPLES", "20")),
+)
+
+
+def prometheus_lines(prefix: str = "webdev") -> list:
+    """Token, cost and max_tokens metrics in the Prometheus text format."""
+    lines = [f"# TYPE {prefix}_tokens_total counter"]
+    for (agent, model), usage in sorted(usage_ledger.by_agent_model.items()):
+        for kind, count in (("prompt", usage.prompt_tokens), ("cached_prompt", usage.cached_tokens),
+                            ("completion", usage.completion_tokens)):
+            lines.append(f'{prefix}_tokens_total{{agent="{agent}",model="{model}",type="{kind}"}} {count}')
+    lines.append(f"# TYPE {prefix}_cost_usd_total counter")
+    for (agent, model), usage in sorted(usage_ledger.by_agent_model.items()):
+        lines.append(f'{prefix}_cost_usd_total{{agent="{agent}",model="{model}"}} {usage.cost:.6f}')
+    lines.append(f"# TYPE {prefix}_model_calls_total counter")
+    for (agent, model), usage in sorted(usage_ledger.by_agent_model.items()):
+        lines.append(f'{prefix}_model_calls_total{{agent="{agent}",model="{model}"}} {usage.calls}')
+    lines.append(f"# TYPE {prefix}_completion_tokens_p99 gauge")
+    for agent, samples in sorted(completion_budget.lengths.items()):
+        lines.append(f'{prefix}_completion_tokens_p99{{agent="{agent}"}} {percentile(samples, 99):.0f}')
+    lines.append(f"# TYPE {prefix}_truncated_completions_total counter")
+    for agent, count in sorted(completion_budget.truncations.items()):
+        lines.append(f'{prefix}_truncated_completions_total{{agent="{agent}"}} {count}')
+    return lines